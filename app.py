@@ -1,25 +1,109 @@
 import streamlit as st
 from dotenv import load_dotenv
-from src.image_generator import ImageGenerator
 from src.config import Config
 from src.utils import setup_page, display_error
 from src.prompt_library import PROMPT_LIBRARY, get_random_prompt
 from src.prompt_enhancer import PromptEnhancer
-from src.history_manager import HistoryManager
-from PIL import Image
-import random
+from src.job_queue import JobQueue, QueueFull
+from src.metrics import metrics, start_exporters
+import os
+import sys
+import uuid
+from functools import partial
+from typing import TYPE_CHECKING
+
+# Heavier modules (huggingface_hub, PIL, NumPy, history storage) are imported
+# inside the functions that use them, so the sidebar paints right away and
+# pages that don't need them never load them
+if TYPE_CHECKING:
+    from src.history_manager import HistoryManager
+    from src.image_generator import ImageGenerator
+    from src.result_cache import ResultCache
+    from src.session_gallery import SessionGallery
+    from src.upload_ingest import UploadIngestor
 
 # Load environment variables
 load_dotenv()
 
+@st.cache_resource
+def get_result_cache(cache_dir: str, max_bytes: int) -> "ResultCache":
+    """One result cache per process, shared by all sessions"""
+    from src.result_cache import ResultCache
+    return ResultCache(cache_dir, max_bytes)
+
+@st.cache_resource
+def get_generator(api_key: str, _config: Config) -> "ImageGenerator":
+    """One generator per process, shared by all sessions and reruns"""
+    from src.http_pool import configure_http_pool
+    from src.image_generator import ImageGenerator
+    
+    configure_http_pool(
+        max_connections=_config.http_max_connections,
+        keepalive_expiry=_config.http_keepalive_expiry
+    )
+    return ImageGenerator.from_config(
+        _config,
+        cache=get_result_cache(_config.cache_dir, _config.cache_max_bytes)
+    )
+
+@st.cache_resource
+def get_job_queue(num_workers: int, max_pending: int) -> JobQueue:
+    """One worker pool per process; every session's generations go through it"""
+    return JobQueue(num_workers=num_workers, max_pending=max_pending)
+
+@st.cache_resource
+def get_upload_ingestor(max_side: int, max_pixels: int) -> "UploadIngestor":
+    """Normalised uploads are shared by content hash across reruns and sessions"""
+    from src.upload_ingest import UploadIngestor
+    return UploadIngestor(max_side=max_side, max_pixels=max_pixels)
+
+@st.cache_resource
+def get_history_manager(backend: str, fsync: bool = True) -> "HistoryManager":
+    """One history manager per process, so concurrent sessions share group commits"""
+    from src.history_manager import HistoryManager
+    return HistoryManager(backend=backend, fsync=fsync)
+
+def history_manager() -> "HistoryManager":
+    """The shared history manager, opened by the first page that records or reads history"""
+    return get_history_manager(
+        os.getenv("HISTORY_BACKEND", "jsonl"),
+        fsync=os.getenv("HISTORY_FSYNC", "true").lower() not in ("0", "false", "no")
+    )
+
+def session_gallery(create: bool = True) -> "SessionGallery":
+    """This session's gallery, created on first use; None if create is False and there is none yet"""
+    if 'history' not in st.session_state:
+        if not create:
+            return None
+        st.session_state.history = create_session_gallery()
+    else:
+        st.session_state.history.touch()  # Still in use, however long since the last image
+    return st.session_state.history
+
+def create_session_gallery() -> "SessionGallery":
+    """Gallery for this session: thumbnails in memory, full images on disk"""
+    from src.session_gallery import SessionGallery, remove_stale_galleries
+    
+    gallery_root = os.getenv("GALLERY_DIR", ".session_gallery")
+    remove_stale_galleries(gallery_root)
+    return SessionGallery(
+        os.path.join(gallery_root, st.session_state.session_id),
+        max_memory_bytes=int(os.getenv("GALLERY_MEMORY_MB", "8")) * 1024 * 1024,
+        thumbnail_format=os.getenv("GALLERY_THUMBNAIL_FORMAT", "WEBP")
+    )
+
 def main():
     setup_page()
     
     # Initialize session state
-    if 'history' not in st.session_state:
-        st.session_state.history = []
-    if 'history_manager' not in st.session_state:
-        st.session_state.history_manager = HistoryManager()
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    
+    # Prometheus export (once per process)
+    start_exporters(
+        port=int(os.getenv("METRICS_PORT", "0")) or None,
+        path=os.getenv("METRICS_FILE") or None
+    )
     
     # Sidebar
     with st.sidebar:
@@ -27,7 +111,8 @@ def main():
         
         page = st.radio(
             "Navigation",
-            ["🎨 Generate", "📚 Prompt Library", "📊 Analytics", "🖼️ History"]
+            ["🎨 Generate", "📚 Prompt Library", "📊 Analytics", "🖼️ History"],
+            key="page"
         )
         
         st.divider()
@@ -35,14 +120,15 @@ def main():
         st.markdown("AI Image Generator with advanced features")
     
     # Main content based on page selection
-    if page == "🎨 Generate":
-        show_generate_page()
-    elif page == "📚 Prompt Library":
-        show_prompt_library()
-    elif page == "📊 Analytics":
-        show_analytics()
-    elif page == "🖼️ History":
-        show_history()
+    with metrics.timer("render", page=page.split(" ", 1)[1]):
+        if page == "🎨 Generate":
+            show_generate_page()
+        elif page == "📚 Prompt Library":
+            show_prompt_library()
+        elif page == "📊 Analytics":
+            show_analytics()
+        elif page == "🖼️ History":
+            show_history()
 
 def show_generate_page():
     st.title("🎨 AI Image Generator Pro")
@@ -51,7 +137,9 @@ def show_generate_page():
     # Initialize generator
     try:
         config = Config()
-        generator = ImageGenerator(config.api_key)
+        generator = get_generator(config.api_key, config)
+        job_queue = get_job_queue(config.job_workers, config.job_max_pending)
+        ingestor = get_upload_ingestor(config.upload_max_side, config.upload_max_pixels)
     except ValueError as e:
         display_error(str(e))
         st.stop()
@@ -60,15 +148,41 @@ def show_generate_page():
     tab1, tab2, tab3 = st.tabs(["✨ Single Image", "🎲 Batch Generate", "🎭 Style Transfer"])
     
     with tab1:
-        show_single_generation(generator)
+        show_single_generation(generator, job_queue)
     
     with tab2:
-        show_batch_generation(generator)
+        show_batch_generation(generator, job_queue)
     
     with tab3:
-        show_style_transfer()
+        show_style_transfer(generator, job_queue, ingestor)
+
+def submit_job(job_queue, fn, *args, **kwargs):
+    """Queue a generation for this session; None (with a warning) when the server is busy"""
+    try:
+        return job_queue.submit(st.session_state.session_id, fn, *args, **kwargs)
+    except QueueFull:
+        st.warning("⏳ The server is busy right now. Please try again in a moment.")
+        return None
+
+def job_result(job) -> dict:
+    """Result dictionary of a finished job, including unexpected failures"""
+    if job.status == "done":
+        return job.result
+    return {"success": False, "error": f"❌ Error: {job.error}"}
+
+@st.fragment(run_every=1.0)
+def wait_for_jobs(job_queue, job_ids, label, finished_before=0):
+    """Poll queued jobs and rerun the page whenever another one finishes"""
+    jobs = [job_queue.get(job_id) for job_id in job_ids]
+    finished = sum(1 for job in jobs if job is None or job.done)
+    if finished > finished_before:
+        st.rerun()
+    
+    ahead = min(job_queue.position(job.id) for job in jobs if job is not None and not job.done)
+    status = f"{ahead} request(s) ahead of you" if ahead else "in progress"
+    st.progress(finished / len(jobs), text=f"{label} ({status})")
 
-def show_single_generation(generator):
+def show_single_generation(generator, job_queue):
     """Single image generation with all features"""
     
     col1, col2 = st.columns([2, 1])
@@ -165,8 +279,15 @@ def show_single_generation(generator):
             
             add_watermark = st.checkbox("Add watermark", key="adv_watermark")
     
+    draft_first = st.toggle(
+        "⚡ Draft first",
+        key="single_draft_first",
+        help="Preview a quick low-resolution, low-step draft, and render the final image at the chosen "
+             "size and steps only when you accept it. Both use the same seed."
+    )
+    
     # Generate button
-    if st.button("🎨 Generate Image", type="primary", use_container_width=True):
+    if st.button("⚡ Generate Draft" if draft_first else "🎨 Generate Image", type="primary", use_container_width=True):
         if not prompt or not prompt.strip():
             st.warning("Please enter a prompt")
             return
@@ -176,8 +297,20 @@ def show_single_generation(generator):
         if style != "None":
             final_prompt = PromptEnhancer.enhance_prompt(prompt, style=style)
         
-        with st.spinner("Generating your masterpiece..."):
-            result = generator.generate_image(
+        if draft_first:
+            job_id = submit_job(
+                job_queue,
+                generator.generate_draft,
+                prompt=final_prompt,
+                size=size,
+                guidance_scale=guidance_scale,
+                negative_prompt=negative_prompt,
+                seed=seed
+            )
+        else:
+            job_id = submit_job(
+                job_queue,
+                generator.generate_image,
                 prompt=final_prompt,
                 size=size,
                 guidance_scale=guidance_scale,
@@ -185,70 +318,146 @@ def show_single_generation(generator):
                 seed=seed,
                 num_inference_steps=num_steps
             )
-        
-        if result["success"]:
-            # Add to history
-            st.session_state.history.append({
-                "image": result["image"],
+        if job_id:
+            st.session_state.single_job = {
+                "id": job_id,
                 "prompt": final_prompt,
-                "settings": {
+                "size": size,
+                "guidance": guidance_scale,
+                "steps": num_steps,
+                "style": style,
+                "draft": draft_first,
+                "recorded": False
+            }
+    
+    # The job keeps running across reruns; show it until the next one is submitted
+    pending = st.session_state.get("single_job")
+    if pending:
+        job = job_queue.get(pending["id"])
+        if job is None:
+            st.session_state.pop("single_job")
+        elif not job.done:
+            wait_for_jobs(job_queue, [job.id], "Drafting a preview..." if pending.get("draft") else
+                          "Generating your masterpiece...")
+        elif pending.get("draft"):
+            show_draft_result(generator, job_queue, job, pending)
+        else:
+            show_single_result(generator, job, pending, add_watermark)
+
+def show_draft_result(generator, job_queue, job, pending):
+    """Display a finished draft; accepting it queues the final render with the same seed"""
+    result = job_result(job)
+    if not result["success"]:
+        display_error(result["error"])
+        return
+    
+    generation = result["generation"]
+    st.image(
+        result["image"],
+        caption=f"Draft preview · {result['width']}x{result['height']} · "
+                f"{generation['num_inference_steps']} steps · seed {result['seed']}",
+        use_column_width=True
+    )
+    st.caption(f"Not what you wanted? Adjust the prompt and generate another draft. "
+               f"Accepting renders it at {pending['size']} with {pending['steps']} steps and the same seed.")
+    if st.button("✅ Accept & Render Final", key="accept_draft", type="primary", use_container_width=True):
+        job_id = submit_job(
+            job_queue,
+            generator.refine,
+            generation,
+            size=pending["size"],
+            num_inference_steps=pending["steps"]
+        )
+        if job_id:
+            # The final render is shown and recorded like any single generation
+            st.session_state.single_job = {**pending, "id": job_id, "draft": False, "recorded": False}
+            st.rerun()
+
+def show_single_result(generator, job, pending, add_watermark):
+    """Display a finished single generation, recording it in history once"""
+    result = job_result(job)
+    final_prompt = pending["prompt"]
+    size = pending["size"]
+    
+    if not pending["recorded"]:
+        pending["recorded"] = True
+        if result["success"]:
+            # Add to history, as the server sent it rather than re-encoded
+            image_bytes, extension = result.stored_bytes()
+            session_gallery().add(
+                image_bytes,
+                prompt=final_prompt,
+                settings={
                     "size": size,
-                    "guidance": guidance_scale,
-                    "steps": num_steps,
+                    "guidance": pending["guidance"],
+                    "steps": pending["steps"],
                     "seed": result.get("seed")
-                }
-            })
+                },
+                image=result["image"],
+                extension=extension
+            )
             
-            st.session_state.history_manager.add_generation(
+            # The generation parameters let History and Analytics serve this image again
+            history_manager().add_generation(
                 prompt=final_prompt,
-                settings={"size": size, "guidance": guidance_scale},
-                success=True
+                settings={
+                    "size": size,
+                    "guidance": pending["guidance"],
+                    "style": pending["style"],
+                    "generation": result.get("generation")
+                },
+                success=True,
+                duration=job.duration
             )
-            
-            st.success("✅ Image generated successfully!")
-            
-            # Display image
-            st.image(result["image"], caption=final_prompt, use_column_width=True)
-            
-            # Image info
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Size", f"{result['width']}x{result['height']}")
-            with col2:
-                st.metric("Seed", result.get('seed', 'N/A'))
-            with col3:
-                st.metric("Steps", num_steps)
-            
-            # Download options
-            col1, col2 = st.columns(2)
-            with col1:
-                st.download_button(
-                    label="📥 Download Image",
-                    data=result["image_bytes"],
-                    file_name=f"generated_{result['timestamp']}.png",
-                    mime="image/png"
-                )
-            with col2:
-                if add_watermark:
-                    watermarked = generator.add_watermark(result["image"])
-                    from io import BytesIO
-                    buf = BytesIO()
-                    watermarked.save(buf, format='PNG')
-                    st.download_button(
-                        label="📥 Download with Watermark",
-                        data=buf.getvalue(),
-                        file_name=f"watermarked_{result['timestamp']}.png",
-                        mime="image/png"
-                    )
         else:
-            display_error(result["error"])
-            st.session_state.history_manager.add_generation(
+            history_manager().add_generation(
                 prompt=final_prompt,
-                settings={"size": size},
-                success=False
+                settings={"size": size, "style": pending["style"]},
+                success=False,
+                error=result["error"],
+                duration=job.duration
+            )
+    
+    if result["success"]:
+        st.success("✅ Image generated successfully!")
+        
+        # Display image
+        st.image(result["image"], caption=final_prompt, use_column_width=True)
+        
+        # Image info
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Size", f"{result['width']}x{result['height']}")
+        with col2:
+            st.metric("Seed", result.get('seed', 'N/A'))
+        with col3:
+            st.metric("Steps", pending["steps"])
+        
+        # Download options
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="📥 Download Image",
+                data=partial(result.get, "image_bytes"),  # Encoded only on download
+                file_name=f"generated_{result['timestamp']}.{result['extension']}",
+                mime=result["mime_type"]
             )
+        with col2:
+            if add_watermark:
+                # Watermarked once per result, encoded only on download
+                if "watermarked" not in pending:
+                    pending["watermarked"] = generator.watermark_result(result)
+                watermarked = pending["watermarked"]
+                st.download_button(
+                    label="📥 Download with Watermark",
+                    data=partial(watermarked.get, "image_bytes"),
+                    file_name=f"watermarked_{result['timestamp']}.{watermarked['extension']}",
+                    mime=watermarked["mime_type"]
+                )
+    else:
+        display_error(result["error"])
 
-def show_batch_generation(generator):
+def show_batch_generation(generator, job_queue):
     """Batch generation mode"""
     st.markdown("### 🎲 Generate Multiple Variations")
     st.info("Generate multiple images with different random seeds")
@@ -266,57 +475,104 @@ def show_batch_generation(generator):
         size = st.selectbox("Size", ["512x512", "768x768"], key="batch_size")
     with col2:
         guidance = st.slider("Guidance", 1.0, 20.0, 7.5, key="batch_guidance")
+        add_watermark = st.checkbox("Add watermark", key="batch_watermark")
     
     if st.button("🎲 Generate Batch", type="primary"):
         if not prompt or not prompt.strip():
             st.warning("Please enter a prompt")
             return
         
-        with st.spinner(f"Generating {batch_count} variations..."):
-            results = generator.generate_batch(
+        job_ids = []
+        for _ in range(batch_count):
+            job_id = submit_job(
+                job_queue,
+                generator.generate_image,
                 prompt=prompt,
-                count=batch_count,
                 size=size,
-                guidance_scale=guidance
+                guidance_scale=guidance  # Unseeded: each variation draws its own seed
             )
+            if job_id is None:
+                break  # Keep whatever fit in the queue
+            job_ids.append(job_id)
+        if job_ids:
+            st.session_state.batch_jobs = job_ids
+    
+    # Fill the grid as each variation finishes
+    job_ids = st.session_state.get("batch_jobs")
+    if job_ids:
+        jobs = [job_queue.get(job_id) for job_id in job_ids]
+        finished = sum(1 for job in jobs if job is None or job.done)
+        
+        # Watermark the whole batch in one parallel pass once every variation is in
+        watermarked = {}
+        if add_watermark and finished == len(jobs):
+            cached = st.session_state.get("batch_watermarked")
+            if cached is None or cached["ids"] != job_ids:
+                done = [job for job in jobs if job is not None]
+                results = generator.watermark_batch([job_result(job) for job in done])
+                cached = {"ids": job_ids, "results": {job.id: r for job, r in zip(done, results)}}
+                st.session_state.batch_watermarked = cached
+            watermarked = cached["results"]
         
-        # Display in grid
-        cols = st.columns(2)
-        for idx, result in enumerate(results):
-            with cols[idx % 2]:
+        show_batch_results(jobs, watermarked)
+        if finished < len(jobs):
+            wait_for_jobs(job_queue, job_ids, f"{finished}/{len(jobs)} variations done", finished)
+
+def show_batch_results(jobs, watermarked=None):
+    """Display a batch grid with a placeholder for each unfinished variation"""
+    cols = st.columns(2)
+    for idx, job in enumerate(jobs):
+        with cols[idx % 2]:
+            if job is None:
+                st.info(f"Variation {idx+1} expired")
+            elif not job.done:
+                st.info(f"⏳ Variation {idx+1} {'generating' if job.status == 'running' else 'queued'}...")
+            else:
+                result = job_result(job)
                 if result["success"]:
-                    st.image(result["image"], caption=f"Variation {idx+1} (Seed: {result.get('seed', 'N/A')})")
+                    st.image(
+                        result["image"],
+                        caption=f"Variation {idx+1} (Seed: {result.get('seed', 'N/A')}, {job.duration:.1f}s)"
+                    )
                     st.download_button(
                         label=f"📥 Download #{idx+1}",
-                        data=result["image_bytes"],
-                        file_name=f"batch_{idx+1}_{result['timestamp']}.png",
-                        mime="image/png",
-                        key=f"download_batch_{idx}"
+                        data=partial(result.get, "image_bytes"),  # Encoded only on download
+                        file_name=f"batch_{idx+1}_{result['timestamp']}.{result['extension']}",
+                        mime=result["mime_type"],
+                        key=f"download_batch_{job.id}"
                     )
+                    marked = (watermarked or {}).get(job.id)
+                    if marked is not None:
+                        st.download_button(
+                            label=f"📥 Download #{idx+1} with Watermark",
+                            data=partial(marked.get, "image_bytes"),
+                            file_name=f"watermarked_batch_{idx+1}_{marked['timestamp']}.{marked['extension']}",
+                            mime=marked["mime_type"],
+                            key=f"download_batch_watermarked_{job.id}"
+                        )
+                else:
+                    display_error(f"Variation {idx+1}: {result['error']}")
 
-def show_style_transfer():
+def show_style_transfer(generator, job_queue, ingestor):
     """Style transfer with image-to-image"""
+    from src.upload_ingest import UploadRejected
     st.markdown("### 🎭 Style Transfer & Image Transformation")
     st.info("Upload an image and transform it with AI! The app generates a new image based on your prompt and blends it with the original.")
     
-    # Initialize generator
-    try:
-        config = Config()
-        generator = ImageGenerator(config.api_key)
-    except ValueError as e:
-        display_error(str(e))
-        return
-    
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### 📤 Upload Image")
         uploaded_file = st.file_uploader("Choose an image", type=['png', 'jpg', 'jpeg'], key="style_upload")
         
+        init_image = None
         if uploaded_file:
-            from PIL import Image
-            init_image = Image.open(uploaded_file)
-            st.image(init_image, caption="Original Image", use_column_width=True)
+            try:
+                init_image = ingestor.ingest(uploaded_file.getvalue())
+            except UploadRejected as e:
+                display_error(f"❌ {e}")
+            else:
+                st.image(init_image, caption="Original Image", use_column_width=True)
     
     with col2:
         st.markdown("#### ✨ Transformation Settings")
@@ -372,6 +628,27 @@ def show_style_transfer():
             key="style_guidance"
         )
         
+        from src.blending import BLEND_MODES
+        blend_mode = st.selectbox(
+            "Blend Mode",
+            list(BLEND_MODES.keys()),
+            help="How the generated image is combined with yours",
+            key="style_blend_mode"
+        )
+        
+        mask_file = st.file_uploader(
+            "Strength mask (optional)",
+            type=['png', 'jpg', 'jpeg'],
+            help="Greyscale image: white areas are fully transformed, black areas keep the original",
+            key="style_mask"
+        )
+        mask = None
+        if mask_file:
+            try:
+                mask = ingestor.ingest(mask_file.getvalue(), mode="L")
+            except UploadRejected as e:
+                display_error(f"❌ Mask: {e}")
+        
         use_negative = st.checkbox("Use negative prompt", value=True, key="style_negative")
         negative_prompt = None
         if use_negative:
@@ -382,51 +659,80 @@ def show_style_transfer():
             )
     
     # Transform button
-    if uploaded_file and st.button("🎨 Transform Image", type="primary", use_container_width=True):
+    mask_ready = mask_file is None or mask is not None
+    if init_image is not None and mask_ready and st.button("🎨 Transform Image", type="primary", use_container_width=True):
         if not transformation_prompt or not transformation_prompt.strip():
             st.warning("Please enter a transformation prompt")
             return
         
-        with st.spinner("Transforming your image..."):
-            result = generator.image_to_image(
-                prompt=transformation_prompt,
-                init_image=init_image,
-                strength=strength,
-                guidance_scale=guidance,
-                negative_prompt=negative_prompt
-            )
-        
-        if result["success"]:
-            st.success("✅ Image transformed successfully!")
-            
-            # Show before/after comparison
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("#### Before")
-                st.image(init_image, use_column_width=True)
-            with col2:
-                st.markdown("#### After")
-                st.image(result["image"], use_column_width=True)
-            
-            # Download button
-            st.download_button(
-                label="📥 Download Transformed Image",
-                data=result["image_bytes"],
-                file_name=f"transformed_{result['timestamp']}.png",
-                mime="image/png"
-            )
-            
-            # Settings used
-            with st.expander("⚙️ Settings Used"):
-                st.json({
-                    "prompt": transformation_prompt,
-                    "strength": strength,
-                    "guidance_scale": guidance,
-                    "negative_prompt": negative_prompt,
-                    "size": f"{result['width']}x{result['height']}"
-                })
+        job_id = submit_job(
+            job_queue,
+            generator.image_to_image,
+            prompt=transformation_prompt,
+            init_image=init_image,  # Normalised uploads are never modified in place
+            strength=strength,
+            guidance_scale=guidance,
+            negative_prompt=negative_prompt,
+            blend_mode=blend_mode,
+            mask=mask
+        )
+        if job_id:
+            st.session_state.style_job = {
+                "id": job_id,
+                "init_image": init_image,
+                "prompt": transformation_prompt,
+                "strength": strength,
+                "guidance": guidance,
+                "negative_prompt": negative_prompt,
+                "blend_mode": blend_mode,
+                "masked": mask is not None
+            }
+    
+    pending = st.session_state.get("style_job")
+    if pending:
+        job = job_queue.get(pending["id"])
+        if job is None:
+            st.session_state.pop("style_job")
+        elif not job.done:
+            wait_for_jobs(job_queue, [job.id], "Transforming your image...")
         else:
-            display_error(result["error"])
+            show_style_result(job_result(job), pending)
+
+def show_style_result(result, pending):
+    """Display a finished style transfer next to its original"""
+    if result["success"]:
+        st.success("✅ Image transformed successfully!")
+        
+        # Show before/after comparison
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("#### Before")
+            st.image(pending["init_image"], use_column_width=True)
+        with col2:
+            st.markdown("#### After")
+            st.image(result["image"], use_column_width=True)
+        
+        # Download button
+        st.download_button(
+            label="📥 Download Transformed Image",
+            data=partial(result.get, "image_bytes"),  # Encoded only on download
+            file_name=f"transformed_{result['timestamp']}.{result['extension']}",
+            mime=result["mime_type"]
+        )
+        
+        # Settings used
+        with st.expander("⚙️ Settings Used"):
+            st.json({
+                "prompt": pending["prompt"],
+                "strength": pending["strength"],
+                "guidance_scale": pending["guidance"],
+                "negative_prompt": pending["negative_prompt"],
+                "blend_mode": pending["blend_mode"],
+                "strength_mask": pending["masked"],
+                "size": f"{result['width']}x{result['height']}"
+            })
+    else:
+        display_error(result["error"])
 
 def show_prompt_library():
     """Prompt library page"""
@@ -452,7 +758,7 @@ def show_analytics():
     """Analytics dashboard"""
     st.title("📊 Analytics Dashboard")
     
-    stats = st.session_state.history_manager.get_stats()
+    stats = history_manager().get_stats()
     
     # Metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -465,45 +771,299 @@ def show_analytics():
     with col4:
         st.metric("Success Rate", f"{stats['success_rate']:.1f}%")
     
+    # Latency percentiles
+    latency = stats["latency"]
+    if latency["count"]:
+        st.markdown("### ⏱️ Generation Latency")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("p50", f"{latency['p50']:.1f}s")
+        with col2:
+            st.metric("p95", f"{latency['p95']:.1f}s")
+        with col3:
+            st.metric("p99", f"{latency['p99']:.1f}s")
+    
+    # Breakdowns
+    col1, col2 = st.columns(2)
+    with col1:
+        if stats["by_size"]:
+            st.markdown("#### 📐 By Size")
+            st.bar_chart(stats["by_size"])
+    with col2:
+        if stats["by_style"]:
+            st.markdown("#### 🎨 By Style")
+            st.bar_chart(stats["by_style"])
+    if stats["failure_reasons"]:
+        st.markdown("#### ⚠️ Failure Reasons")
+        st.table([
+            {"Reason": reason, "Count": count}
+            for reason, count in sorted(stats["failure_reasons"].items(), key=lambda item: -item[1])
+        ])
+    
+    # Result cache (only available once the API key is configured)
+    try:
+        config = Config()
+    except ValueError:
+        config = None
+    if config is not None:
+        cache_stats = get_result_cache(config.cache_dir, config.cache_max_bytes).stats()
+        st.markdown("### ⚡ Result Cache")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Cache Hits", cache_stats["hits"])
+        with col2:
+            st.metric("Cache Misses", cache_stats["misses"])
+        with col3:
+            st.metric("Hit Rate", f"{cache_stats['hit_rate']:.1f}%")
+        with col4:
+            st.metric("Cache Size", f"{cache_stats['bytes'] / (1024 * 1024):.1f} MB")
+        
+        coalesced = sum(
+            row["value"] for row in metrics.counters()
+            if row["name"] == "generations" and row.get("outcome") == "coalesced"
+        )
+        if coalesced:
+            st.caption(f"🔗 {coalesced:.0f} duplicate in-flight requests shared another session's call")
+    
+    # HTTP keep-alive pool; nothing to show if no request has been made in this process
+    http_pool = sys.modules.get("src.http_pool")
+    pool_stats = http_pool.connection_stats.snapshot() if http_pool else {"requests": 0}
+    if pool_stats["requests"]:
+        st.markdown("### 🔌 Connection Reuse")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("HTTP Requests", pool_stats["requests"])
+        with col2:
+            st.metric("New Connections", pool_stats["new_connections"])
+        with col3:
+            st.metric("Reuse Rate", f"{pool_stats['reuse_rate']:.1f}%")
+    
+    # Per-model health the router picks backends by
+    model_router = sys.modules.get("src.model_router")
+    model_rows = model_router.model_stats.snapshot() if model_router else []
+    if model_rows:
+        st.markdown("### 🧭 Models")
+        st.dataframe(
+            [
+                {
+                    "Model": row["model"],
+                    "Requests": row["requests"],
+                    "Errors": row["errors"],
+                    "Fallbacks": row["fallbacks"],
+                    "Error Rate": f"{row['error_rate']:.0%}",
+                    "s / Megapixel": round(row["seconds_per_mp"], 2) if row["seconds_per_mp"] is not None else None,
+                    "p50 (s)": round(row["p50"], 2) if row["p50"] is not None else None,
+                    "p95 (s)": round(row["p95"], 2) if row["p95"] is not None else None,
+                    "Status": f"⏳ Cooling down ({row['unavailable_for']:.0f}s)" if row["unavailable_for"] else "✅ Available"
+                }
+                for row in model_rows
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    show_pipeline_timings()
+    
     st.divider()
     
     # Recent activity
     st.markdown("### 📈 Recent Activity")
-    recent = st.session_state.history_manager.get_recent(10)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        prompt_filter = st.text_input("Filter by prompt", key="analytics_filter")
+    with col2:
+        page_number = st.number_input("Page", min_value=1, value=1, step=1, key="analytics_page")
+    
+    page_size = 10
+    recent = history_manager().get_recent(
+        page_size,
+        offset=(page_number - 1) * page_size,
+        prompt_filter=prompt_filter or None
+    )
     
     if recent:
-        for entry in recent:
+        for idx, entry in enumerate(recent):
             with st.expander(f"🎨 {entry['prompt'][:50]}... - {entry['timestamp'][:10]}"):
                 st.json(entry)
+                generation = entry.get("settings", {}).get("generation")
+                if generation:
+                    show_stored_generation(generation, f"analytics_{(page_number - 1) * page_size + idx}")
+    elif stats["total_generations"] > 0:
+        st.info("No matching generations on this page.")
     else:
         st.info("No generation history yet. Start creating!")
 
+def show_pipeline_timings():
+    """Per-stage latency percentiles from the metrics registry"""
+    rows = metrics.stage_summary()
+    if not rows:
+        return
+    
+    st.markdown("### ⏱️ Pipeline Timings")
+    stages = sorted({row["stage"] for row in rows})
+    selected = st.multiselect("Stages", stages, default=stages, key="timing_stages")
+    
+    ms = lambda seconds: round(seconds * 1000, 1) if seconds is not None else None
+    st.dataframe(
+        [
+            {
+                "Stage": row["stage"],
+                "Model": row.get("model", ""),
+                "Size": row.get("size", ""),
+                "Detail": ", ".join(
+                    f"{k}={v}" for k, v in row.items()
+                    if k not in ("stage", "model", "size", "count", "total", "p50", "p95", "p99")
+                ),
+                "Count": row["count"],
+                "p50 (ms)": ms(row["p50"]),
+                "p95 (ms)": ms(row["p95"]),
+                "p99 (ms)": ms(row["p99"])
+            }
+            for row in rows if row["stage"] in selected
+        ],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    counters = metrics.counters()
+    if counters:
+        with st.expander("Counters"):
+            st.dataframe(counters, use_container_width=True, hide_index=True)
+    st.download_button(
+        label="📥 Download Prometheus metrics",
+        data=metrics.to_prometheus,  # Rendered only on download
+        file_name="metrics.prom",
+        mime="text/plain"
+    )
+
+def show_stored_generation(params, widget_key):
+    """Serve a recorded generation from the result cache, or regenerate it with the same seed"""
+    try:
+        config = Config()
+    except ValueError:
+        return  # No result cache or generator without an API key
+    from src.result_cache import ResultCache
+    key = ResultCache.make_key(**params)
+    # Images loaded for open expanders, so reruns don't reread them or count as cache lookups
+    shown = st.session_state.setdefault("stored_images", {})
+    if not st.toggle("🔁 Show image", key=f"show_{widget_key}"):
+        shown.pop(key, None)
+        return
+    
+    job_queue = get_job_queue(config.job_workers, config.job_max_pending)
+    replays = st.session_state.setdefault("replay_jobs", {})
+    job = job_queue.get(replays[key]) if key in replays else None
+    
+    cached = shown.get(key)
+    if cached is None:
+        cached = get_result_cache(config.cache_dir, config.cache_max_bytes).get(key)
+        if cached is not None:
+            shown[key] = cached
+    if cached is not None:
+        image_bytes, metadata = cached
+        caption = f"Seed {params['seed']} · served from storage"
+        extension, mime_type = metadata.get("extension", "png"), metadata.get("mime_type", "image/png")
+    elif job is not None and job.done and job_result(job)["success"]:
+        result = job_result(job)  # Too large for the cache; keep the regenerated result
+        image_bytes, caption = result["image_bytes"], f"Seed {params['seed']} · regenerated"
+        extension, mime_type = result["extension"], result["mime_type"]
+    elif job is not None and not job.done:
+        wait_for_jobs(job_queue, [job.id], "Regenerating with the same seed...")
+        return
+    else:
+        if job is not None:
+            display_error(job_result(job)["error"])
+        st.info("This image is no longer stored. Regenerating it with the same seed costs one inference call.")
+        if st.button("🎲 Regenerate", key=f"regenerate_{widget_key}"):
+            job_id = submit_job(job_queue, get_generator(config.api_key, config).replay, params)
+            if job_id:
+                replays[key] = job_id
+                st.rerun()
+        return
+    
+    st.image(image_bytes, caption=caption, use_column_width=True)
+    st.download_button(
+        label="📥 Download",
+        data=image_bytes,
+        file_name=f"generation_{key[:8]}.{extension}",
+        mime=mime_type,
+        key=f"download_{widget_key}"
+    )
+
 def show_history():
-    """Session history gallery"""
+    """Session history gallery, then earlier generations served from storage"""
     st.title("🖼️ Generation History")
     st.markdown("View all images generated in this session")
     
-    if not st.session_state.history:
+    gallery = session_gallery(create=False)
+    if not gallery:
         st.info("No images generated yet. Go to Generate page to create some!")
-        return
+    else:
+        show_session_gallery(gallery)
+    show_earlier_generations()
+
+def show_session_gallery(gallery):
+    """Paged grid of this session's images"""
+    # Only the current page of thumbnails is sent to the browser
+    page_size = 9
+    page_number = st.number_input(
+        f"Page (of {gallery.page_count(page_size)})",
+        min_value=1,
+        max_value=gallery.page_count(page_size),
+        value=1,
+        step=1,
+        key="history_page"
+    )
+    items = gallery.page(page_number, page_size)
     
     # Display in grid
     cols_per_row = 3
-    for idx in range(0, len(st.session_state.history), cols_per_row):
+    for idx in range(0, len(items), cols_per_row):
         cols = st.columns(cols_per_row)
         for col_idx, col in enumerate(cols):
             img_idx = idx + col_idx
-            if img_idx < len(st.session_state.history):
-                item = st.session_state.history[img_idx]
+            if img_idx < len(items):
+                item = items[img_idx]
                 with col:
-                    st.image(item["image"], use_column_width=True)
+                    st.image(gallery.thumbnail(item["id"]), use_column_width=True)
                     st.caption(item["prompt"][:50] + "...")
+                    # Full-resolution bytes are read from disk only when clicked
+                    st.download_button(
+                        label="📥 Download",
+                        data=partial(gallery.load_image_bytes, item["id"]),
+                        file_name=f"history_{item['id'][:8]}.{item['extension']}",
+                        mime=item["mime_type"],
+                        key=f"download_history_{item['id']}"
+                    )
                     with st.expander("Details"):
                         st.json(item["settings"])
+                        if st.toggle("Show full size", key=f"full_{item['id']}"):
+                            st.image(gallery.load_image_bytes(item["id"]), use_column_width=True)
     
     if st.button("🗑️ Clear History"):
-        st.session_state.history = []
+        gallery.clear()
         st.rerun()
 
+def show_earlier_generations():
+    """Generations from every session, re-served from the result cache without new inference"""
+    st.divider()
+    st.markdown("### 🗄️ Earlier Generations")
+    st.caption("Images are served from storage by their prompt, settings and seed; evicted ones can be regenerated exactly")
+    
+    page_size = 10
+    page_number = st.number_input("Page", min_value=1, value=1, step=1, key="earlier_page")
+    recent = history_manager().get_recent(page_size, offset=(page_number - 1) * page_size)
+    reproducible = [
+        (idx, entry) for idx, entry in enumerate(recent)
+        if entry.get("success") and entry.get("settings", {}).get("generation")
+    ]
+    if not reproducible:
+        st.info("No stored generations on this page.")
+        return
+    for idx, entry in reproducible:
+        generation = entry["settings"]["generation"]
+        with st.expander(f"🎨 {entry['prompt'][:50]}... - seed {generation['seed']} - {entry['timestamp'][:10]}"):
+            show_stored_generation(generation, f"earlier_{(page_number - 1) * page_size + idx}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1 @@
+# Offline benchmarks (no Hugging Face calls)
@@ -0,0 +1,121 @@
+"""Benchmark dozens of concurrent generations: thread pool vs. asyncio
+
+Usage: python -m benchmarks.bench_async [--requests 48] [--latency 0.5]
+
+Both generators send real HTTP requests to a local fake server running in
+this process. Each case runs in a fresh process and reports wall time,
+the peak number of threads, and peak memory growth while the batch runs.
+"""
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import resource
+import threading
+import time
+
+from benchmarks.fake_server import FakeInferenceServer
+from src.model_router import ModelRouter, ModelSpec
+
+
+class ThreadSampler:
+    """Record the largest thread count seen while running"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count() - 1)  # Not counting the sampler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def server_router(url):
+    """Send every request to the fake server (a URL model id is called directly)"""
+    return ModelRouter([ModelSpec(url, max_side=4096)])
+
+
+def threaded_batch(url, count):
+    from src.image_generator import ImageGenerator
+    generator = ImageGenerator("hf_benchmark", max_workers=count, router=server_router(url))
+    return generator.generate_batch("benchmark prompt", count=count, num_inference_steps=4)
+
+
+def async_batch(url, count):
+    from src.async_image_generator import AsyncImageGenerator
+
+    async def run():
+        async with AsyncImageGenerator("hf_benchmark", max_concurrency=count,
+                                       router=server_router(url)) as generator:
+            return await generator.generate_batch("benchmark prompt", count=count, num_inference_steps=4)
+    return asyncio.run(run())
+
+
+CASES = {"thread pool": threaded_batch, "asyncio": async_batch}
+
+
+def run_case(name, url, count, queue):
+    # Preload both generators so module imports are not part of the measurement
+    importlib.import_module("src.async_image_generator")
+    importlib.import_module("src.image_generator")
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        results = CASES[name](url, count)
+        elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((elapsed, sampler.peak, peak / 1024, sum(1 for r in results if r["success"])))
+
+
+def check_timeout_and_cancel(url, latency):
+    """A per-call timeout returns an error result; cancelling a batch stops its requests"""
+    from src.async_image_generator import AsyncImageGenerator
+
+    async def run():
+        async with AsyncImageGenerator("hf_benchmark", router=server_router(url)) as generator:
+            start = time.perf_counter()
+            result = await generator.generate_image("timeout probe", timeout=latency / 4)
+            print(f"timeout={latency / 4:g}s: {result['error']} ({time.perf_counter() - start:.2f}s)")
+
+            batch = asyncio.ensure_future(generator.generate_batch("cancel probe", count=8))
+            await asyncio.sleep(latency / 4)
+            start = time.perf_counter()
+            batch.cancel()
+            try:
+                await batch
+            except asyncio.CancelledError:
+                print(f"cancelled a batch of 8 in flight in {1000 * (time.perf_counter() - start):.1f} ms")
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=48, help="Generations in flight at once")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake server latency in seconds")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with FakeInferenceServer(latency=args.latency, image_size=(512, 512)) as server:
+        print(f"{args.requests} concurrent 512x512 generations, {args.latency}s server latency")
+        print(f"{'case':<14} {'wall (s)':>9} {'threads':>8} {'peak MB':>8} {'ok':>4}")
+        for name in CASES:
+            queue = context.Queue()
+            process = context.Process(target=run_case, args=(name, server.url, args.requests, queue))
+            process.start()
+            elapsed, threads, peak_mb, ok = queue.get()
+            process.join()
+            print(f"{name:<14} {elapsed:>9.2f} {threads:>8} {peak_mb:>8.1f} {ok:>4}")
+        check_timeout_and_cancel(server.url, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Benchmark batch time-to-first-image and wall-clock time against concurrency
+
+Usage: python -m benchmarks.bench_batch [--latency 0.5] [--count 6]
+"""
+import argparse
+import time
+
+from benchmarks.fakes import FakeInferenceClient, make_generator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake request latency in seconds")
+    parser.add_argument("--count", type=int, default=6, help="Images per batch")
+    parser.add_argument("--fail-every", type=int, default=0, help="Fail every Nth request")
+    args = parser.parse_args()
+    
+    print(f"batch of {args.count}, {args.latency:.2f}s per request")
+    print(f"{'workers':>8} {'first (s)':>10} {'wall (s)':>10} {'speedup':>8} {'ok':>4}")
+    baseline = None
+    for workers in (1, 2, 3, 4, 6, 8):
+        client = FakeInferenceClient(latency=args.latency, fail_every=args.fail_every)
+        generator = make_generator(client, max_workers=workers)
+        
+        start = time.perf_counter()
+        first = None
+        ok = 0
+        for _, result in generator.iter_batch("benchmark prompt", count=args.count, size="256x256"):
+            first = first or time.perf_counter() - start
+            ok += result["success"]
+        elapsed = time.perf_counter() - start
+        
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {first:>10.2f} {elapsed:>10.2f} {baseline / elapsed:>7.1f}x {ok:>4}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark image-to-image blending time and peak memory on large uploads
+
+Usage: python -m benchmarks.bench_blend [--size 3840x2160] [--tile-rows 64]
+
+Each case runs in a fresh process; peak memory is the growth of the
+process's max RSS over the already-loaded inputs.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+from PIL import Image
+
+from benchmarks.fakes import make_test_image
+from src.blending import TileBlender
+
+GENERATED_SIZE = 768  # Longest side requested from the model
+
+
+def legacy_downscaled(base, layer, strength, tile_rows):
+    """Previous behaviour: shrink the upload to 768 px, then Image.blend"""
+    small = base.resize(layer.size, Image.Resampling.LANCZOS)
+    return Image.blend(small, layer, strength)
+
+
+def pil_full_resolution(base, layer, strength, tile_rows):
+    """Upscale the whole layer, then Image.blend at full size"""
+    return Image.blend(base, layer.resize(base.size, Image.Resampling.LANCZOS), strength)
+
+
+def tiled(precision, mode="normal", masked=False):
+    def run(base, layer, strength, tile_rows):
+        mask = Image.linear_gradient("L") if masked else None
+        return TileBlender(tile_rows=tile_rows, precision=precision).blend(base, layer, strength, mode, mask)
+    return run
+
+
+CASES = {
+    "legacy 768px Image.blend": legacy_downscaled,
+    "full-res Image.blend": pil_full_resolution,
+    "tiled uint8": tiled("uint8"),
+    "tiled float16": tiled("float16"),
+    "tiled float32": tiled("float32"),
+    "tiled uint8 overlay": tiled("uint8", "overlay"),
+    "tiled float32 overlay": tiled("float32", "overlay"),
+    "tiled uint8 + mask": tiled("uint8", masked=True),
+}
+
+
+def run_case(name, width, height, tile_rows, queue):
+    base = make_test_image(width, height, seed=1)
+    ratio = GENERATED_SIZE / max(width, height)
+    layer = make_test_image(int(width * ratio) // 8 * 8, int(height * ratio) // 8 * 8, seed=2)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    result = CASES[name](base, layer, 0.6, tile_rows)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((elapsed, peak / 1024, result.size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="3840x2160", help="Upload size, WIDTHxHEIGHT")
+    parser.add_argument("--tile-rows", type=int, default=64, help="Rows per blending strip")
+    args = parser.parse_args()
+    width, height = map(int, args.size.split("x"))
+
+    context = multiprocessing.get_context("spawn")
+    print(f"upload {width}x{height}, generated image {GENERATED_SIZE}px, {args.tile_rows} rows per tile")
+    print(f"{'case':<26} {'time (s)':>9} {'peak MB':>8} {'output':>11}")
+    for name in CASES:
+        queue = context.Queue()
+        process = context.Process(target=run_case, args=(name, width, height, args.tile_rows, queue))
+        process.start()
+        elapsed, peak_mb, size = queue.get()
+        process.join()
+        print(f"{name:<26} {elapsed:>9.2f} {peak_mb:>8.1f} {size[0]:>5}x{size[1]:<5}")
+
+
+if __name__ == "__main__":
+    main()
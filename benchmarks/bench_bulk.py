@@ -0,0 +1,129 @@
+"""Benchmark the bulk generation runner: memory vs. input size, and crash/resume
+
+Usage: python -m benchmarks.bench_bulk [--sizes 1000 20000] [--concurrency 8]
+
+Uses a fake backend returning small images, so the numbers show the
+runner's own overhead. Each size runs in a fresh process; peak memory is
+the growth of the process's max RSS during the run. Two checks follow: a
+crashed run resumes without repeating records, and a rerun retries the
+records that failed because the model was loading, but not the others.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.fakes import FakeInferenceClient, make_generator
+from src.bulk_generate import BulkRunner, read_records
+from src.scheduler import RequestScheduler
+
+
+def write_input(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"p{i}", "prompt": f"prompt number {i}", "style": "Anime"}) + "\n")
+
+
+def run_size(path, out_dir, concurrency, queue):
+    generator = make_generator(FakeInferenceClient(latency=0.002))
+    runner = BulkRunner(generator, out_dir, concurrency=concurrency, size="64x64", seed=1)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(path) as f:
+        counts = runner.run(read_records(f, "jsonl"), progress=None)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((counts["succeeded"], elapsed, peak / 1024))
+
+
+class FlakyClient(FakeInferenceClient):
+    """Fails every 5th prompt as loading (transient) and every 7th with a permanent error"""
+
+    def text_to_image(self, prompt: str, width: int = 512, height: int = 512, **kwargs):
+        number = int(prompt.split("prompt number ")[1].split(",")[0])
+        if number % 5 == 0:
+            raise RuntimeError("Model is currently loading")
+        if number % 7 == 0:
+            raise RuntimeError("Fake backend error")
+        return super().text_to_image(prompt, width=width, height=height, **kwargs)
+
+
+def crash_after(records, limit):
+    for i, record in enumerate(records):
+        if i == limit:
+            raise KeyboardInterrupt  # Simulated crash mid-run
+        yield record
+
+
+def check_resume(tmp, concurrency):
+    """Crash a run part-way, resume it, and check each record is in the manifest once"""
+    path, out_dir = os.path.join(tmp, "resume.jsonl"), os.path.join(tmp, "resume_out")
+    write_input(path, 500)
+    generator = make_generator(FakeInferenceClient(latency=0.002))
+    try:
+        with open(path) as f:
+            BulkRunner(generator, out_dir, concurrency=concurrency, size="64x64", seed=1).run(
+                crash_after(read_records(f, "jsonl"), 300), progress=None)
+    except KeyboardInterrupt:
+        pass
+    with open(path) as f:
+        counts = BulkRunner(generator, out_dir, concurrency=concurrency, size="64x64", seed=1).run(
+            read_records(f, "jsonl"), progress=None)
+    with open(os.path.join(out_dir, "manifest.jsonl")) as f:
+        indexes = [json.loads(line)["index"] for line in f]
+    ok = sorted(indexes) == list(range(500))
+    print(f"resume: {counts['skipped']} skipped, {counts['succeeded']} generated after the crash, "
+          f"{len(indexes)} manifest lines for 500 records -> {'OK' if ok else 'FAILED'}")
+
+
+def check_retry_failed(tmp, concurrency):
+    """Rerun after transient failures: only the loading failures are generated again"""
+    path, out_dir = os.path.join(tmp, "retry.jsonl"), os.path.join(tmp, "retry_out")
+    write_input(path, 100)
+    runs = []
+    for client in (FlakyClient(latency=0.002), FakeInferenceClient(latency=0.002), FakeInferenceClient(latency=0.002)):
+        generator = make_generator(client, scheduler=RequestScheduler(max_retries=0))
+        with open(path) as f:
+            runs.append(BulkRunner(generator, out_dir, concurrency=concurrency, size="64x64", seed=1).run(
+                read_records(f, "jsonl"), progress=None))
+    last = {}  # The last manifest entry per index counts
+    with open(os.path.join(out_dir, "manifest.jsonl")) as f:
+        for line in f:
+            entry = json.loads(line)
+            last[entry["index"]] = entry
+    failed = sorted(index for index, entry in last.items() if not entry["success"])
+    transient = sum(1 for i in range(100) if i % 5 == 0)
+    ok = (runs[1]["succeeded"] == transient and runs[1]["failed"] == 0 and runs[2]["succeeded"] == 0
+          and failed == [i for i in range(100) if i % 7 == 0 and i % 5 != 0])
+    print(f"retry: first run {runs[0]['failed']} failed, rerun generated {runs[1]['succeeded']} "
+          f"(loading failures), third run {runs[2]['succeeded']}; {len(failed)} permanent failures left "
+          f"-> {'OK' if ok else 'FAILED'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000], help="Input records")
+    parser.add_argument("--concurrency", type=int, default=8, help="Generations in flight")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'records':>8} {'time (s)':>9} {'records/s':>10} {'peak MB':>8}")
+        for size in args.sizes:
+            path = os.path.join(tmp, f"prompts_{size}.jsonl")
+            write_input(path, size)
+            queue = context.Queue()
+            process = context.Process(target=run_size, args=(path, os.path.join(tmp, f"out_{size}"), args.concurrency, queue))
+            process.start()
+            done, elapsed, peak_mb = queue.get()
+            process.join()
+            print(f"{done:>8} {elapsed:>9.2f} {done / elapsed:>10.0f} {peak_mb:>8.1f}")
+        check_resume(tmp, args.concurrency)
+        check_retry_failed(tmp, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
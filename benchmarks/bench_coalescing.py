@@ -0,0 +1,46 @@
+"""Benchmark remote calls made for concurrent identical seeded requests
+
+Usage: python -m benchmarks.bench_coalescing [--latency 0.5] [--sessions 8]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeInferenceClient, make_generator
+from src.prompt_library import PROMPT_LIBRARY
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake request latency in seconds")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions per prompt")
+    parser.add_argument("--prompts", type=int, default=3, help="Distinct library prompts requested")
+    args = parser.parse_args()
+
+    prompts = [p for category in PROMPT_LIBRARY.values() for p in category][:args.prompts]
+    requests = [prompt for prompt in prompts for _ in range(args.sessions)]
+
+    client = FakeInferenceClient(latency=args.latency)
+    generator = make_generator(client)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        results = list(pool.map(
+            lambda prompt: generator.generate_image(prompt, size="256x256", seed=42),
+            requests
+        ))
+    elapsed = time.perf_counter() - start
+
+    stats = generator.single_flight.stats()
+    ok = sum(result["success"] for result in results)
+    images = {}  # prompt -> first image seen
+    same = all(
+        images.setdefault(prompt, result["image"]) is result["image"]
+        for prompt, result in zip(requests, results)
+    )
+    print(f"{len(requests)} requests ({args.prompts} prompts x {args.sessions} sessions), seed 42")
+    print(f"remote calls: {client.calls}  saved: {stats['saved']}  ok: {ok}  wall: {elapsed:.2f}s")
+    print(f"waiters share the leader's image: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark prompt exploration at full quality vs. drafts with one final render
+
+Usage: python -m benchmarks.bench_draft [--iterations 6] [--size 768x768] [--steps 50]
+
+A user tries `--iterations` prompts before keeping the last one. Without
+drafts every attempt is a full render; with drafts every attempt is a
+draft and only the kept one is rendered at full size and steps. The fake
+backend's latency is proportional to steps x megapixels, like a diffusion
+model, so the reported inference time is the compute each workflow costs.
+The final render must reuse the accepted draft's seed and model.
+"""
+import argparse
+import time
+
+from benchmarks.fakes import FakeInferenceClient, make_generator
+
+
+class StepCostClient(FakeInferenceClient):
+    """Fake backend whose latency grows with steps and resolution"""
+
+    def __init__(self, seconds_per_step_mp: float):
+        super().__init__(latency=0.0)
+        self.seconds_per_step_mp = seconds_per_step_mp
+        self.compute = 0.0  # Simulated inference seconds
+
+    def text_to_image(self, prompt: str, width: int = 512, height: int = 512, num_inference_steps: int = 50,
+                      **kwargs):
+        seconds = self.seconds_per_step_mp * num_inference_steps * width * height / 1_000_000
+        self.compute += seconds
+        time.sleep(seconds)
+        return super().text_to_image(prompt, width=width, height=height, **kwargs)
+
+
+def explore(draft_first: bool, iterations: int, size: str, steps: int, seconds_per_step_mp: float):
+    client = StepCostClient(seconds_per_step_mp)
+    generator = make_generator(client)
+    first_image = []  # Seconds until each attempt is on screen
+    start = time.perf_counter()
+    for i in range(iterations):
+        attempt = time.perf_counter()
+        prompt = f"exploration prompt, attempt {i}"
+        if draft_first:
+            result = generator.generate_draft(prompt, size=size)
+        else:
+            result = generator.generate_image(prompt, size=size, num_inference_steps=steps)
+        assert result["success"], result["error"]
+        first_image.append(time.perf_counter() - attempt)
+    consistent = True
+    if draft_first:
+        draft = result["generation"]
+        final = generator.refine(draft, size=size, num_inference_steps=steps)
+        assert final["success"], final["error"]
+        consistent = (final["seed"] == draft["seed"] and final["generation"]["model"] == draft["model"]
+                      and f"{final['width']}x{final['height']}" == size)
+    return time.perf_counter() - start, client.compute, client.calls, max(first_image), consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=6, help="Prompts tried before keeping one")
+    parser.add_argument("--size", default="768x768", help="Final image size")
+    parser.add_argument("--steps", type=int, default=50, help="Final inference steps")
+    parser.add_argument("--seconds-per-step-mp", type=float, default=0.01,
+                        help="Fake backend cost per step per megapixel")
+    args = parser.parse_args()
+
+    print(f"{args.iterations} prompt attempts, final render {args.size} at {args.steps} steps")
+    print(f"{'workflow':<16} {'calls':>6} {'inference (s)':>14} {'wall (s)':>9} {'slowest preview (s)':>20}")
+    rows = {}  # Inference seconds per workflow
+    for draft_first in (False, True):
+        wall, compute, calls, preview, consistent = explore(
+            draft_first, args.iterations, args.size, args.steps, args.seconds_per_step_mp
+        )
+        name = "drafts + final" if draft_first else "full quality"
+        rows[draft_first] = compute
+        print(f"{name:<16} {calls:>6} {compute:>14.2f} {wall:>9.2f} {preview:>20.3f}")
+    print(f"inference cost saved: {1 - rows[True] / rows[False]:.0%}")
+    print("OK" if consistent else "FAILED: the final render did not reuse the draft's seed and model")
+    if not consistent:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Micro-benchmark per-call output encoding cost
+
+Compares re-encoding the decoded server response in each output format
+with passing the raw response bytes through.
+
+Usage: python -m benchmarks.bench_encode [--repeat 5] [--response-format JPEG]
+"""
+import argparse
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from benchmarks.fakes import encode_image, make_test_image
+from src.image_encoding import ImageEncoder
+
+ENCODERS = [
+    ("passthrough", None),
+    ("PNG level 1", ImageEncoder("PNG", png_compress_level=1, passthrough=False)),
+    ("PNG level 6", ImageEncoder("PNG", png_compress_level=6, passthrough=False)),
+    ("PNG level 9", ImageEncoder("PNG", png_compress_level=9, passthrough=False)),
+    ("JPEG q90", ImageEncoder("JPEG", quality=90, passthrough=False)),
+    ("WEBP q80", ImageEncoder("WEBP", quality=80, passthrough=False)),
+]
+
+
+def time_encoder(encoder, body: bytes, repeat: int) -> tuple:
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        image = Image.open(BytesIO(body))
+        start = time.perf_counter()
+        if encoder is None:
+            data = ImageEncoder("ORIGINAL").build_result(image)["image_bytes"]
+        else:
+            data = encoder.build_result(image)["image_bytes"]
+        best = min(best, time.perf_counter() - start)
+        size = len(data)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--response-format", default="JPEG", choices=["JPEG", "PNG", "WEBP"])
+    args = parser.parse_args()
+    
+    print(f"server response format: {args.response_format}")
+    print(f"{'size':>6} {'mode':>12} {'ms/call':>9} {'KB':>8}")
+    for side in (512, 768, 1024):
+        body = encode_image(make_test_image(side, side), args.response_format)
+        for name, encoder in ENCODERS:
+            seconds, size = time_encoder(encoder, body, args.repeat)
+            print(f"{side:>6} {name:>12} {seconds * 1000:>9.2f} {size / 1024:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
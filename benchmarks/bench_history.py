@@ -0,0 +1,92 @@
+"""Benchmark HistoryManager latency at different history sizes
+
+Usage: python -m benchmarks.bench_history [--backend jsonl|sqlite] [--sizes 100 10000 100000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from src.history_manager import HistoryManager
+
+
+def make_entry(i: int) -> dict:
+    return {
+        "timestamp": "2024-01-01T00:00:00",
+        "prompt": f"benchmark prompt number {i} with a few extra words",
+        "settings": {"size": "512x512", "guidance": 7.5},
+        "success": i % 10 != 0
+    }
+
+
+def prefill(path: str, size: int):
+    with open(path, 'w') as f:
+        for i in range(size):
+            f.write(json.dumps(make_entry(i)) + "\n")
+
+
+def time_appends(manager: HistoryManager, appends: int) -> float:
+    start = time.perf_counter()
+    for i in range(appends):
+        manager.add_generation(prompt=f"new prompt {i}", settings={"size": "512x512"}, success=True)
+    return (time.perf_counter() - start) / appends
+
+
+def time_reads(manager: HistoryManager, reads: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(reads):
+        manager.get_stats()
+    stats_time = (time.perf_counter() - start) / reads
+    
+    start = time.perf_counter()
+    for page in range(reads):
+        manager.get_recent(10, offset=page * 10)
+    recent_time = (time.perf_counter() - start) / reads
+    return stats_time, recent_time
+
+
+def time_legacy_rewrites(entries: list, path: str, appends: int) -> float:
+    """The previous write path: rewrite the whole file with indent=2"""
+    start = time.perf_counter()
+    for i in range(appends):
+        entries.append(make_entry(i))
+        with open(path, 'w') as f:
+            json.dump(entries, f, indent=2)
+    return (time.perf_counter() - start) / appends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["jsonl", "sqlite"], default="jsonl")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--appends", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=50)
+    parser.add_argument("--legacy-appends", type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"backend: {args.backend}")
+    print(f"{'entries':>10} {'append (ms)':>12} {'stats (ms)':>11} {'recent (ms)':>12} {'legacy rewrite (ms)':>20}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            seed_path = os.path.join(tmp, f"history_{size}.jsonl")
+            prefill(seed_path, size)
+            if args.backend == "sqlite":
+                manager = HistoryManager(
+                    history_file=os.path.join(tmp, f"history_{size}.db"),
+                    legacy_file=seed_path,
+                    backend="sqlite"
+                )
+            else:
+                manager = HistoryManager(history_file=seed_path, legacy_file=None)
+            append_ms = time_appends(manager, args.appends) * 1000
+            stats_ms, recent_ms = (t * 1000 for t in time_reads(manager, args.reads))
+            
+            legacy_path = os.path.join(tmp, f"history_{size}.json")
+            legacy_ms = time_legacy_rewrites(
+                [make_entry(i) for i in range(size)], legacy_path, args.legacy_appends
+            ) * 1000
+            print(f"{size:>10} {append_ms:>12.3f} {stats_ms:>11.3f} {recent_ms:>12.3f} {legacy_ms:>20.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark per-request latency with and without the shared keep-alive pool
+
+A local server simulates connection setup cost (TCP + TLS handshake) once
+per new connection, then several simulated users send requests in parallel.
+
+Usage: python -m benchmarks.bench_http_pool [--users 8] [--requests 10] [--handshake-ms 40]
+"""
+import argparse
+import http.server
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx2
+from huggingface_hub import get_session
+
+from src.http_pool import configure_http_pool, connection_stats
+
+
+def start_server(handshake: float, latency: float) -> http.server.ThreadingHTTPServer:
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def setup(self):
+            time.sleep(handshake)  # Paid once per connection
+            super().setup()
+        
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        
+        def log_message(self, *args):
+            pass
+    
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_users(url: str, users: int, requests: int, send) -> list:
+    def user(_):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            send(url)
+            timings.append(time.perf_counter() - start)
+        return timings
+    
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        return [t for timings in pool.map(user, range(users)) for t in timings]
+
+
+def fresh_client(url: str):
+    with httpx2.Client() as client:
+        client.post(url, content=b"{}")
+
+
+def pooled_client(url: str):
+    get_session().post(url, content=b"{}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--handshake-ms", type=float, default=40)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    
+    server = start_server(args.handshake_ms / 1000, args.latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_port}/"
+    configure_http_pool()
+    
+    print(f"{args.users} users x {args.requests} requests, {args.handshake_ms:.0f} ms handshake")
+    print(f"{'mode':>8} {'mean (ms)':>10} {'p95 (ms)':>9}")
+    for name, send in (("fresh", fresh_client), ("pooled", pooled_client)):
+        timings = sorted(run_users(url, args.users, args.requests, send))
+        p95 = timings[int(0.95 * (len(timings) - 1))]
+        print(f"{name:>8} {statistics.mean(timings) * 1000:>10.1f} {p95 * 1000:>9.1f}")
+    
+    stats = connection_stats.snapshot()
+    print(f"pooled: {stats['requests']} requests over {stats['new_connections']} connections "
+          f"({stats['reuse_rate']:.1f}% reused)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
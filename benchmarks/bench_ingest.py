@@ -0,0 +1,91 @@
+"""Benchmark decoding a large phone-sized upload: full decode vs. draft ingestion
+
+Usage: python -m benchmarks.bench_ingest [--size 6000x4000] [--max-side 2048]
+
+Each case runs in a fresh process; peak memory is the growth of the
+process's max RSS over the encoded upload.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from benchmarks.fakes import encode_image, make_test_image
+from src.upload_ingest import UploadIngestor
+
+
+def full_decode(data, max_side):
+    """Previous behaviour: decode everything, then resize"""
+    image = Image.open(BytesIO(data))
+    image.load()
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return image
+
+
+def ingest(data, max_side):
+    return UploadIngestor(max_side=max_side).ingest(data)
+
+
+def ingest_rerun(data, max_side):
+    """Second ingestion of the same bytes, as on a page rerun"""
+    ingestor = UploadIngestor(max_side=max_side)
+    ingestor.ingest(data)
+    start = time.perf_counter()
+    image = ingestor.ingest(data)
+    print(f"    (cached lookup {1000 * (time.perf_counter() - start):.1f} ms)")
+    return image
+
+
+CASES = {"full decode + resize": full_decode, "draft ingestion": ingest, "ingest twice (rerun)": ingest_rerun}
+
+
+def write_upload(path, width, height):
+    with open(path, "wb") as f:
+        f.write(encode_image(make_test_image(width, height), "JPEG"))
+
+
+def run_case(name, path, max_side, queue):
+    with open(path, "rb") as f:
+        data = f.read()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    image = CASES[name](data, max_side)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((elapsed, peak / 1024, image.size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="6000x4000", help="Upload size, WIDTHxHEIGHT")
+    parser.add_argument("--max-side", type=int, default=2048, help="Longest side after ingestion")
+    args = parser.parse_args()
+    width, height = map(int, args.size.split("x"))
+    context = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Build the upload in a child so this process stays small; children
+        # inherit its peak RSS at fork time
+        path = os.path.join(tmp, "upload.jpg")
+        writer = context.Process(target=write_upload, args=(path, width, height))
+        writer.start()
+        writer.join()
+
+        print(f"{width}x{height} JPEG ({os.path.getsize(path) / 1e6:.1f} MB), normalised to {args.max_side}px")
+        print(f"{'case':<24} {'time (s)':>9} {'peak MB':>8} {'output':>11}")
+        for name in CASES:
+            queue = context.Queue()
+            process = context.Process(target=run_case, args=(name, path, args.max_side, queue))
+            process.start()
+            elapsed, peak_mb, size = queue.get()
+            process.join()
+            print(f"{name:<24} {elapsed:>9.2f} {peak_mb:>8.1f} {size[0]:>5}x{size[1]:<5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Benchmark model routing against local fake backends with different latency profiles
+
+Usage: python -m benchmarks.bench_routing [--requests 40] [--concurrency 4]
+
+Each scenario runs the same requests twice over real HTTP: once with a
+registry of only the primary model (what the app did before routing), once
+with the primary and a secondary model behind a ModelRouter. Reported are
+wall time, mean and p95 request latency, and how many requests each model
+served.
+
+Scenarios:
+    slow primary      the primary answers 4x slower than the secondary
+    primary loading   the primary returns 503 "loading" for its first requests
+    rate limited      the primary answers 40% of requests with 429
+    oversized         1536x1536 requests, which only the primary supports
+
+A last check runs routing and the result cache together: a repeated
+seeded request, mixed with unseeded traffic that probes every model, must
+be served by one model and reach the network only once.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_server import FakeInferenceServer
+from src.image_generator import ImageGenerator
+from src.model_router import ModelRouter, ModelSpec, ModelStats
+from src.result_cache import ResultCache
+from src.scheduler import RequestScheduler
+
+SCENARIOS = {
+    "slow primary": {
+        "primary": {"latency": 0.2, "jitter": 0.02},
+        "secondary": {"latency": 0.05, "jitter": 0.01},
+        "size": "512x512"
+    },
+    "primary loading": {
+        "primary": {"latency": 0.05, "statuses": [503] * 6},
+        "secondary": {"latency": 0.1},
+        "size": "512x512"
+    },
+    "rate limited": {
+        "primary": {"latency": 0.05, "error_rate": 0.4, "error_status": 429, "retry_after": "0.5"},
+        "secondary": {"latency": 0.1},
+        "size": "512x512"
+    },
+    "oversized": {
+        "primary": {"latency": 0.1},
+        "secondary": {"latency": 0.02},
+        "size": "1536x1536"
+    }
+}
+
+
+def run_case(primary, secondary, size, requests, concurrency, routed):
+    """Send the requests and return wall time, latencies, failures and the model behind each result"""
+    stats = ModelStats()
+    models = [ModelSpec(primary.url, max_side=2048)]
+    if routed:
+        models.append(ModelSpec(secondary.url, max_side=1024))
+    generator = ImageGenerator(
+        "hf_benchmark",
+        scheduler=RequestScheduler(max_retries=8, base_delay=0.2),
+        router=ModelRouter(models, stats=stats, cooldown=1.0)
+    )
+
+    def request(i):
+        start = time.perf_counter()
+        result = generator.generate_image(f"routing prompt {i}", size=size, num_inference_steps=4)
+        return time.perf_counter() - start, result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(request, range(requests)))
+    wall = time.perf_counter() - start
+    latencies = [seconds for seconds, _ in outcomes]
+    served = [result["generation"]["model"] for _, result in outcomes if result["success"]]
+    failed = sum(1 for _, result in outcomes if not result["success"])
+    fallbacks = sum(row["fallbacks"] for row in stats.snapshot())
+    return wall, latencies, failed, served, fallbacks
+
+
+def check_seeded_cache():
+    """A repeated seeded request is served by one model and made once, however unseeded requests are routed"""
+    with FakeInferenceServer(latency=0.05) as primary, FakeInferenceServer(latency=0.01) as secondary, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        generator = ImageGenerator(
+            "hf_benchmark",
+            cache=ResultCache(cache_dir),
+            router=ModelRouter([ModelSpec(primary.url), ModelSpec(secondary.url)], stats=ModelStats(),
+                               explore=1.0)  # Unseeded requests always probe the runner-up
+        )
+        results = []
+        for i in range(3):
+            results.append(generator.generate_image("seeded prompt", seed=7, num_inference_steps=4))
+            for j in range(4):
+                generator.generate_image(f"unseeded prompt {i}-{j}", num_inference_steps=4)
+        served = {result["generation"]["model"] for result in results}
+        calls = len(primary.requests) + len(secondary.requests) - 12  # Less the unseeded requests
+    ok = all(result["success"] for result in results) and len(served) == 1 and calls == 1
+    print(f"seeded request x3 with a cache: {calls} network call(s), served by {len(served)} model(s)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per case")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once")
+    args = parser.parse_args()
+
+    ok = True
+    print(f"{args.requests} requests per case, {args.concurrency} in flight")
+    print(f"{'scenario':<17} {'registry':<16} {'wall (s)':>9} {'mean (s)':>9} {'p95 (s)':>8} "
+          f"{'primary':>8} {'secondary':>10} {'fallbacks':>10} {'failed':>7}")
+    for name, scenario in SCENARIOS.items():
+        walls = {}
+        for routed in (False, True):
+            with FakeInferenceServer(**scenario["primary"]) as primary, \
+                    FakeInferenceServer(**scenario["secondary"]) as secondary:
+                wall, latencies, failed, served, fallbacks = run_case(
+                    primary, secondary, scenario["size"], args.requests, args.concurrency, routed
+                )
+            walls[routed] = wall
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            on_primary = served.count(primary.url)
+            on_secondary = served.count(secondary.url)
+            registry = "primary + router" if routed else "primary only"
+            print(f"{name:<17} {registry:<16} {wall:>9.2f} {statistics.mean(latencies):>9.3f} {p95:>8.3f} "
+                  f"{on_primary:>8} {on_secondary:>10} {fallbacks:>10} {failed:>7}")
+            ok = ok and not failed
+            if routed and name == "oversized":
+                ok = ok and on_secondary == 0  # The secondary can't render that size
+        if name != "oversized":
+            ok = ok and walls[True] < walls[False]
+    ok = check_seeded_cache() and ok
+    print("OK" if ok else "FAILED")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
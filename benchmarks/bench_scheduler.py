@@ -0,0 +1,64 @@
+"""Exercise the retry/rate-limit scheduler against scripted 503/429 sequences
+
+Each scenario runs generate_image through a RequestScheduler against a local
+fake endpoint and reports whether it succeeded, how many HTTP attempts it
+took, and how long it waited.
+
+Usage: python -m benchmarks.bench_scheduler
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_server import FakeInferenceServer, make_server_generator
+from src.scheduler import RequestScheduler, TokenBucket
+
+SCENARIOS = [
+    # (name, statuses, Retry-After, expect success)
+    ("model loading", [503, 503], None, True),
+    ("rate limited + Retry-After", [429, 429], "1", True),
+    ("mixed 503/429", [503, 429, 503], None, True),
+    ("retries exhausted", [503] * 10, "0", False),
+    ("non-retryable 500", [500], None, False),
+]
+
+
+def run_scenarios():
+    print(f"{'scenario':>28} {'ok':>5} {'attempts':>9} {'time (s)':>9}")
+    failures = 0
+    for name, statuses, retry_after, expect_ok in SCENARIOS:
+        with FakeInferenceServer(statuses, retry_after=retry_after) as server:
+            scheduler = RequestScheduler(max_retries=3, base_delay=0.2, max_wait=10)
+            generator = make_server_generator(server, scheduler=scheduler)
+            start = time.perf_counter()
+            result = generator.generate_image("scheduler test", size="64x64")
+            elapsed = time.perf_counter() - start
+        ok = result["success"]
+        failures += ok != expect_ok
+        mark = "" if ok == expect_ok else "  <-- unexpected"
+        print(f"{name:>28} {str(ok):>5} {len(server.requests):>9} {elapsed:>9.2f}{mark}")
+    return failures
+
+
+def run_shared_bucket(sessions: int = 6, rate: float = 4.0):
+    """Concurrent sessions share one bucket, so calls are spaced at `rate`/s"""
+    with FakeInferenceServer() as server:
+        scheduler = RequestScheduler(TokenBucket(rate=rate, capacity=1))
+        generator = make_server_generator(server, scheduler=scheduler)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            results = list(pool.map(lambda _: generator.generate_image("bucket test", size="64x64"), range(sessions)))
+        elapsed = time.perf_counter() - start
+    ok = sum(r["success"] for r in results)
+    print(f"\n{sessions} sessions through a {rate:.0f}/s bucket: {ok}/{sessions} ok in {elapsed:.2f}s "
+          f"(expected >= {(sessions - 1) / rate:.2f}s)")
+
+
+def main():
+    failures = run_scenarios()
+    run_shared_bucket()
+    if failures:
+        raise SystemExit(f"{failures} scenario(s) behaved unexpectedly")
+
+
+if __name__ == "__main__":
+    main()
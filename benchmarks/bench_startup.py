@@ -0,0 +1,71 @@
+"""Benchmark app cold start: module import time and first render per page
+
+Every measurement runs in a fresh interpreter, like a new container or
+server process. First render uses Streamlit's AppTest to run a brand-new
+session on the given page.
+
+Usage: python -m benchmarks.bench_startup [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["huggingface_hub", "httpx2", "PIL.Image", "numpy", "sqlite3"]
+
+PAGES = ["🎨 Generate", "📚 Prompt Library", "📊 Analytics", "🖼️ History"]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+RENDER_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+at.session_state["page"] = %r
+start = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "errors": [e.value for e in at.exception],
+                  "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def probe(code: str) -> dict:
+    env = dict(os.environ, HUGGINGFACE_API_KEY=os.getenv("HUGGINGFACE_API_KEY", "hf_benchmark"))
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh processes per measurement (median reported)")
+    args = parser.parse_args()
+
+    print(f"{'measurement':<28} {'median (s)':>10}  heavy modules loaded")
+    for module in ("streamlit", "app"):  # streamlit alone is the floor
+        runs = [probe(IMPORT_PROBE % (module, HEAVY_MODULES)) for _ in range(args.repeat)]
+        median = statistics.median(r["seconds"] for r in runs)
+        print(f"{'import ' + module:<28} {median:>10.3f}  {', '.join(runs[0]['loaded']) or '-'}")
+
+    for page in PAGES:
+        runs = [probe(RENDER_PROBE % (page, HEAVY_MODULES)) for _ in range(args.repeat)]
+        median = statistics.median(r["seconds"] for r in runs)
+        errors = f"  (errors: {runs[0]['errors']})" if runs[0]["errors"] else ""
+        print(f"{'first render: ' + page.split(' ', 1)[1]:<28} {median:>10.3f}  "
+              f"{', '.join(runs[0]['loaded']) or '-'}{errors}")
+
+
+if __name__ == "__main__":
+    main()
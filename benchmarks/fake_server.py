@@ -0,0 +1,149 @@
+"""Local stand-in for the Hugging Face text-to-image endpoint"""
+import http.server
+import json
+import random
+import threading
+import time
+from collections import deque
+from io import BytesIO
+from typing import Iterable, Optional, Tuple
+
+from benchmarks.fakes import make_test_image
+
+ERROR_BODIES = {
+    503: {"error": "Model is currently loading", "estimated_time": 1.0},
+    429: {"error": "Rate limit reached. You reached free usage limit."},
+    500: {"error": "Internal server error"}
+}
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    request_queue_size = 128  # Dozens of clients connect at once; the default backlog of 5 resets some
+
+
+class FakeInferenceServer:
+    """
+    HTTP server that answers text-to-image requests like the Inference API
+
+    Args:
+        statuses: Scripted status codes for successive requests (e.g.
+            [503, 503, 429, 200]); once exhausted, requests succeed apart
+            from random errors
+        retry_after: Retry-After header value sent with 429/503, or None
+        response_format: Image format of successful responses
+        latency: Seconds before each response
+        jitter: Extra random latency, uniform in [0, jitter] seconds
+        error_rate: Fraction of unscripted requests answered with error_status
+        error_status: Status code used for random errors
+        image_size: Size of returned images; the requested size when None
+        seed: Seed for the random latency and errors, for repeatable runs
+    """
+    
+    def __init__(
+        self,
+        statuses: Iterable[int] = (),
+        retry_after: Optional[str] = None,
+        response_format: str = "JPEG",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        image_size: Optional[Tuple[int, int]] = None,
+        seed: int = 0
+    ):
+        self.statuses = deque(statuses)
+        self.retry_after = retry_after
+        self.response_format = response_format
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.image_size = image_size
+        self.requests = []  # Status code returned for each request
+        self._random = random.Random(seed)
+        self._bodies = {}  # (width, height) -> encoded image, rendered once
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler_class())
+        self._thread = None
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+    
+    def start(self) -> "FakeInferenceServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self) -> "FakeInferenceServer":
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def next_status(self) -> Tuple[int, float]:
+        """Status code and delay for the next request"""
+        with self._lock:
+            if self.statuses:
+                status = self.statuses.popleft()
+            elif self._random.random() < self.error_rate:
+                status = self.error_status
+            else:
+                status = 200
+            self.requests.append(status)
+            return status, self.latency + self._random.uniform(0, self.jitter)
+    
+    def render(self, payload: dict) -> bytes:
+        params = payload.get("parameters", {})
+        size = self.image_size or (params.get("width") or 512, params.get("height") or 512)
+        with self._lock:
+            if size not in self._bodies:
+                buf = BytesIO()
+                make_test_image(*size).save(buf, format=self.response_format)
+                self._bodies[size] = buf.getvalue()
+            return self._bodies[size]
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status, delay = server.next_status()
+                time.sleep(delay)
+                if status == 200:
+                    self._reply(200, server.render(payload), f"image/{server.response_format.lower()}")
+                else:
+                    body = json.dumps(ERROR_BODIES.get(status, {"error": "Error"})).encode()
+                    self._reply(status, body, "application/json")
+            
+            def _reply(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if status in (429, 503) and server.retry_after is not None:
+                    self.send_header("Retry-After", server.retry_after)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Client timed out or cancelled the request
+            
+            def log_message(self, *args):
+                pass
+        
+        return Handler
+
+
+def make_server_generator(server: FakeInferenceServer, **kwargs):
+    """Build an ImageGenerator that sends real HTTP requests to a fake server"""
+    from src.image_generator import ImageGenerator
+    from src.model_router import ModelRouter, ModelSpec
+    kwargs.setdefault("router", ModelRouter([ModelSpec(server.url, max_side=4096)]))  # A URL model id is called directly
+    return ImageGenerator("hf_benchmark", **kwargs)
@@ -0,0 +1,53 @@
+"""Fake stand-ins for remote services used by the benchmarks"""
+import threading
+import time
+from io import BytesIO
+from PIL import Image
+
+
+def make_test_image(width: int, height: int, seed: int = 0) -> Image.Image:
+    """Photo-like test image: smooth gradients with some noise"""
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    shade = Image.new("L", (width, height), seed * 37 % 256)
+    return Image.merge("RGB", (gradient, noise, shade))
+
+
+def encode_image(image: Image.Image, fmt: str = "JPEG") -> bytes:
+    buf = BytesIO()
+    image.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class FakeInferenceClient:
+    """Mimics InferenceClient.text_to_image with injected latency"""
+    
+    def __init__(self, latency: float = 0.5, fail_every: int = 0, response_format: str = "JPEG"):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.response_format = response_format
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._responses = {}  # (width, height) -> encoded response body
+    
+    def text_to_image(self, prompt: str, width: int = 512, height: int = 512, **kwargs) -> Image.Image:
+        with self._lock:
+            self.calls += 1
+            call_number = self.calls
+        time.sleep(self.latency)
+        if self.fail_every and call_number % self.fail_every == 0:
+            raise RuntimeError("Fake backend error")
+        with self._lock:
+            if (width, height) not in self._responses:
+                self._responses[(width, height)] = encode_image(make_test_image(width, height), self.response_format)
+            body = self._responses[(width, height)]
+        # Like huggingface_hub: a lazily decoded image over the response bytes
+        return Image.open(BytesIO(body))
+
+
+def make_generator(client, **kwargs):
+    """Build an ImageGenerator wired to a fake client"""
+    from src.image_generator import ImageGenerator
+    generator = ImageGenerator("hf_benchmark", **kwargs)
+    generator.client = client
+    return generator
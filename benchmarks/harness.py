@@ -0,0 +1,235 @@
+"""End-to-end benchmark harness against a local fake inference server
+
+Runs scripted load through generate_image, generate_batch, image_to_image and
+HistoryManager, writes a JSON report, and optionally compares it with a
+stored baseline, exiting non-zero when a metric regresses.
+
+Usage:
+    python -m benchmarks.harness [--out report.json] [--compare benchmarks/baseline.json]
+    python -m benchmarks.harness --save-baseline benchmarks/baseline.json
+    python -m benchmarks.harness --diff old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.fake_server import FakeInferenceServer, make_server_generator
+from benchmarks.fakes import make_test_image
+from src.history_manager import HistoryManager
+from src.scheduler import RequestScheduler
+
+# Metric name suffixes and whether a larger value is better; first match wins
+DIRECTIONS = {"_per_s": True, "_s": False, "_rate": False}
+
+
+def summarize(durations, errors, wall):
+    """Latency percentiles, throughput and error rate for one scenario"""
+    ordered = sorted(durations)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+    return {
+        "requests": len(durations),
+        "p50_s": pick(0.50),
+        "p95_s": pick(0.95),
+        "mean_s": statistics.fmean(ordered) if ordered else None,
+        "throughput_per_s": len(durations) / wall if wall else None,
+        "error_rate": errors / len(durations) if durations else 0.0
+    }
+
+
+def timed_calls(fn, count, concurrency):
+    """Run fn(i) count times on a thread pool; return per-call durations, errors and wall time"""
+    def run(i):
+        start = time.perf_counter()
+        result = fn(i)
+        ok = all(r["success"] for r in result) if isinstance(result, list) else result["success"]
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(run, range(count)))
+    wall = time.perf_counter() - start
+    return [d for d, _ in outcomes], sum(1 for _, ok in outcomes if not ok), wall
+
+
+def bench_generate_image(server, args):
+    generator = make_server_generator(server, scheduler=RequestScheduler(max_retries=args.retries, base_delay=0.05))
+    durations, errors, wall = timed_calls(
+        lambda i: generator.generate_image(f"harness prompt {i}", size=args.size),
+        args.requests, args.concurrency
+    )
+    return summarize(durations, errors, wall)
+
+
+def bench_generate_batch(server, args):
+    generator = make_server_generator(
+        server, max_workers=args.concurrency,
+        scheduler=RequestScheduler(max_retries=args.retries, base_delay=0.05)
+    )
+    durations, errors, wall = timed_calls(
+        lambda i: generator.generate_batch(f"harness batch {i}", count=4, size=args.size),
+        max(1, args.requests // 4), 1
+    )
+    return summarize(durations, errors, wall)
+
+
+def bench_image_to_image(server, args):
+    generator = make_server_generator(server, scheduler=RequestScheduler(max_retries=args.retries, base_delay=0.05))
+    init_image = make_test_image(2048, 1536)
+    durations, errors, wall = timed_calls(
+        lambda i: generator.image_to_image(f"harness style {i}", init_image, strength=0.6),
+        max(1, args.requests // 4), args.concurrency
+    )
+    return summarize(durations, errors, wall)
+
+
+def bench_history(backend, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db" if backend == "sqlite" else "history.jsonl")
+        manager = HistoryManager(history_file=path, legacy_file=None, backend=backend)
+        entries = args.history_entries
+
+        start = time.perf_counter()
+        for i in range(entries):
+            manager.add_generation(f"prompt {i}", {"size": args.size, "style": "None"}, duration=0.5)
+        append_s = (time.perf_counter() - start) / entries
+
+        start = time.perf_counter()
+        HistoryManager(history_file=path, legacy_file=None, backend=backend).get_stats()
+        cold_stats_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(20):
+            manager.get_recent(limit=10, prompt_filter="prompt 1")
+        recent_s = (time.perf_counter() - start) / 20
+    return {"entries": entries, "append_s": append_s, "cold_stats_s": cold_stats_s, "recent_s": recent_s}
+
+
+def run(args):
+    """Run every scenario and return the report"""
+    width, height = map(int, args.size.split("x"))
+    server = FakeInferenceServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        image_size=(width, height), seed=args.seed
+    )
+    scenarios = {}
+    with server:
+        for name, bench in (
+            ("generate_image", bench_generate_image),
+            ("generate_batch", bench_generate_batch),
+            ("image_to_image", bench_image_to_image),
+        ):
+            print(f"running {name}...", file=sys.stderr)
+            scenarios[name] = bench(server, args)
+    for backend in ("jsonl", "sqlite"):
+        print(f"running history_{backend}...", file=sys.stderr)
+        scenarios[f"history_{backend}"] = bench_history(backend, args)
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": vars(args).copy()
+        },
+        "scenarios": scenarios
+    }
+
+
+def compare(baseline, report, tolerance, min_delta=0.001):
+    """
+    List metrics that got worse than the baseline by more than tolerance
+
+    Durations that moved by less than min_delta seconds are never counted
+    as regressions, so sub-millisecond timings do not fail on noise.
+
+    Returns:
+        (rows, regressions): one row per compared metric, and the rows
+        that regressed
+    """
+    rows = []
+    for scenario, metrics in report["scenarios"].items():
+        for metric, value in metrics.items():
+            before = baseline.get("scenarios", {}).get(scenario, {}).get(metric)
+            direction = next((up for suffix, up in DIRECTIONS.items() if metric.endswith(suffix)), None)
+            if direction is None or value is None or before is None:
+                continue
+            if before == 0:
+                change = 0.0 if value == 0 else float("inf")
+            else:
+                change = (value - before) / before
+            worse = -change if direction else change
+            noise = not direction and metric.endswith("_s") and abs(value - before) < min_delta
+            rows.append((scenario, metric, before, value, change, worse > tolerance and not noise))
+    return rows, [row for row in rows if row[5]]
+
+
+def print_comparison(rows, tolerance):
+    print(f"{'scenario':<16} {'metric':<18} {'baseline':>10} {'current':>10} {'change':>8}")
+    for scenario, metric, before, value, change, regressed in rows:
+        mark = "  <-- regression" if regressed else ""
+        print(f"{scenario:<16} {metric:<18} {before:>10.4f} {value:>10.4f} {change:>+7.0%}{mark}")
+    print(f"(tolerance {tolerance:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Fraction of requests answered with 503")
+    parser.add_argument("--size", default="512x512", help="Requested and returned image size")
+    parser.add_argument("--requests", type=int, default=24, help="generate_image calls (batches and img2img use a quarter)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent callers")
+    parser.add_argument("--retries", type=int, default=3, help="Scheduler retries for 503s")
+    parser.add_argument("--history-entries", type=int, default=2000, help="Entries appended per history backend")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for fake latency and errors")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare the run against a baseline report")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the report as the new baseline")
+    parser.add_argument("--diff", nargs=2, metavar=("BASELINE", "REPORT"), help="Compare two saved reports, no run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="Ignore duration changes below this many seconds")
+    args = parser.parse_args()
+
+    if args.diff:
+        with open(args.diff[0]) as f:
+            baseline = json.load(f)
+        with open(args.diff[1]) as f:
+            report = json.load(f)
+    else:
+        options = argparse.Namespace(**{
+            k: v for k, v in vars(args).items() if k not in ("out", "compare", "save_baseline", "diff", "tolerance", "min_delta")
+        })
+        report = run(options)
+        for path in filter(None, (args.out, args.save_baseline)):
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"wrote {path}", file=sys.stderr)
+        if not args.compare:
+            print(json.dumps(report["scenarios"], indent=2))
+            return
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    changed = sorted(
+        key for key, value in baseline.get("meta", {}).get("config", {}).items()
+        if report["meta"]["config"].get(key) != value
+    )
+    if changed:
+        print(f"warning: run settings differ from the baseline: {', '.join(changed)}")
+    rows, regressions = compare(baseline, report, args.tolerance, args.min_delta)
+    print_comparison(rows, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Stress the history stores from many processes at once and check nothing is lost
+
+Worker processes (each with several threads, like Streamlit sessions) append
+uniquely tagged entries to one shared history while another process keeps
+compacting the log. Afterwards every tag must be present exactly once, with
+no corrupt lines, and a fresh HistoryManager must count every entry.
+
+`--backend legacy` runs the same load against the previous JSONL write path
+(unlocked appends, unlocked rewrite) to show what the locking prevents.
+
+Usage: python -m benchmarks.stress_history [--backend jsonl|sqlite|legacy] [--processes 4] [--threads 4] [--appends 200]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from src.history_manager import HistoryManager
+from src.history_store import JsonlHistoryStore
+
+
+def legacy_append(path: str, entry: dict):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def legacy_compact(path: str):
+    """Read, rewrite and rename with no lock held, as compaction used to"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(f"{path}.tmp", path)
+
+
+def writer(backend: str, path: str, fsync: bool, worker: int, threads: int, appends: int, results):
+    manager = None if backend == "legacy" else HistoryManager(path, legacy_file=None, backend=backend, fsync=fsync)
+
+    def session(thread: int):
+        for i in range(appends):
+            settings = {"tag": f"{worker}-{thread}-{i}", "size": "512x512"}
+            if manager is None:
+                legacy_append(path, {"timestamp": "", "prompt": "stress", "settings": settings, "success": True})
+            else:
+                manager.add_generation("stress", settings, duration=0.1)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=session, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    commits = manager.store.commit_stats() if manager else {"appends": threads * appends, "commits": threads * appends}
+    results.put({"seconds": time.perf_counter() - start, **commits})
+
+
+def compactor(backend: str, path: str, stop):
+    store = JsonlHistoryStore(path, legacy_path=None) if backend == "jsonl" else None
+    while not stop.is_set():
+        if store is not None:
+            store.compact()
+        elif os.path.exists(path):
+            legacy_compact(path)
+        time.sleep(0.01)
+
+
+def read_tags(backend: str, path: str):
+    """All tags on disk and the number of unreadable lines"""
+    if backend == "sqlite":
+        manager = HistoryManager(path, legacy_file=None, backend="sqlite")
+        return [e["settings"]["tag"] for e in manager.store.iter_entries()], 0
+    tags, corrupt = [], 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                tags.append(json.loads(line)["settings"]["tag"])
+            except ValueError:
+                corrupt += 1
+    return tags, corrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["jsonl", "sqlite", "legacy"], default="jsonl")
+    parser.add_argument("--processes", type=int, default=4, help="Writer processes")
+    parser.add_argument("--threads", type=int, default=4, help="Appending threads per process")
+    parser.add_argument("--appends", type=int, default=200, help="Appends per thread")
+    parser.add_argument("--no-fsync", action="store_true", help="Skip fsync on commit (HISTORY_FSYNC=false)")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db" if args.backend == "sqlite" else "history.jsonl")
+        results, stop = context.Queue(), context.Event()
+        workers = [
+            context.Process(target=writer, args=(args.backend, path, not args.no_fsync, w,
+                                                 args.threads, args.appends, results))
+            for w in range(args.processes)
+        ]
+        background = None
+        if args.backend != "sqlite":  # SQLite never rewrites its file
+            background = context.Process(target=compactor, args=(args.backend, path, stop))
+            background.start()
+
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        reports = [results.get() for _ in workers]
+        for w in workers:
+            w.join()
+        wall = time.perf_counter() - start
+        stop.set()
+        if background:
+            background.join()
+
+        expected = args.processes * args.threads * args.appends
+        tags, corrupt = read_tags(args.backend, path)
+        counted = None
+        if args.backend != "legacy":
+            counted = HistoryManager(path, legacy_file=None, backend=args.backend).get_stats()["total_generations"]
+
+    appends = sum(r["appends"] for r in reports)
+    commits = sum(r["commits"] for r in reports)
+    print(f"backend {args.backend}: {args.processes} processes x {args.threads} threads x {args.appends} appends"
+          f"{'' if not args.no_fsync else ' (no fsync)'}")
+    print(f"{'throughput':<22} {expected / wall:>10.0f} appends/s")
+    print(f"{'appends per commit':<22} {appends / max(commits, 1):>10.1f}")
+    print(f"{'expected entries':<22} {expected:>10}")
+    print(f"{'entries on disk':<22} {len(tags):>10}")
+    print(f"{'lost':<22} {expected - len(set(tags)):>10}")
+    print(f"{'duplicated':<22} {len(tags) - len(set(tags)):>10}")
+    print(f"{'corrupt lines':<22} {corrupt:>10}")
+    if counted is not None:
+        print(f"{'counted by get_stats':<22} {counted:>10}")
+    ok = len(tags) == len(set(tags)) == expected and not corrupt and counted in (None, expected)
+    print("OK" if ok else "FAILED")
+    if not ok and args.backend != "legacy":
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""Asyncio-native image generation on huggingface_hub's AsyncInferenceClient"""
+import asyncio
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from huggingface_hub import AsyncInferenceClient
+from PIL import Image
+
+from src.blending import TileBlender
+from src.image_encoding import ImageEncoder
+from src.image_generator import BaseImageGenerator, generation_error, style_request_size, style_transfer_error
+from src.metrics import metrics
+from src.model_router import ModelRouter
+from src.result_cache import ResultCache
+from src.scheduler import RequestScheduler
+from src.single_flight import AsyncSingleFlight
+from src.watermark import Watermarker
+
+def timeout_error(timeout: Optional[float]) -> Dict[str, Any]:
+    """Result dictionary for a call that ran out of time"""
+    after = f" after {timeout:g} seconds" if timeout else ""
+    return {"success": False, "error": f"⏱️ Request timed out{after}. Please try again.", "retryable": True}
+
+class AsyncImageGenerator(BaseImageGenerator):
+    """
+    ImageGenerator for asyncio code: the same methods, result dictionaries
+    and error messages, as coroutines
+
+    A request in flight is a suspended coroutine rather than a blocked
+    thread, so one event loop can keep dozens of generations going. CPU
+    work (decoding, blending, cache writes) runs in the loop's default
+    executor so it never stalls other requests.
+
+    Every call accepts a `timeout` in seconds (default: the generator's),
+    covering queueing, retries and the request itself; a call that times
+    out returns an error result. Cancelling the awaiting task cancels the
+    request. Use one generator per event loop and close it when done, e.g.
+    with `async with AsyncImageGenerator(api_key) as generator:`.
+
+    Args:
+        api_key: Hugging Face API token
+        max_concurrency: Remote calls in flight at once across all callers
+        timeout: Default per-call timeout in seconds; None waits indefinitely
+        max_workers, cache, encoder, scheduler, blender, watermarker, router,
+            draft_steps, draft_scale: As for ImageGenerator
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = 32,
+        timeout: Optional[float] = None,
+        max_workers: int = 4,
+        cache: Optional[ResultCache] = None,
+        encoder: Optional[ImageEncoder] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        blender: Optional[TileBlender] = None,
+        watermarker: Optional[Watermarker] = None,
+        router: Optional[ModelRouter] = None,
+        draft_steps: int = 8,
+        draft_scale: float = 0.5
+    ):
+        super().__init__(max_workers, cache=cache, encoder=encoder, blender=blender, watermarker=watermarker,
+                         router=router, draft_steps=draft_steps, draft_scale=draft_scale)
+        self.api_key = api_key
+        self.client = AsyncInferenceClient(token=api_key)
+        self.scheduler = scheduler  # Shared token bucket and retries, waited on without threads
+        self.single_flight = AsyncSingleFlight()  # Identical seeded requests share one call
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "AsyncImageGenerator":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the HTTP connections of the async client"""
+        await self.client.close()
+
+    async def _text_to_image(self, models: Optional[List[str]] = None, **kwargs) -> Tuple[Image.Image, str]:
+        """Call the inference API on the routed model; returns the image and the model (see ImageGenerator)"""
+        size = f"{kwargs['width']}x{kwargs['height']}"
+        
+        async def infer(model):
+            with metrics.timer("inference", model=model, size=size):
+                return await self.client.text_to_image(**{**kwargs, "model": model})
+        async with self._slots:
+            return await self.router.acall(infer, kwargs["width"], kwargs["height"], self.scheduler, models=models)
+
+    async def generate_image(
+        self,
+        prompt: str,
+        size: str = "512x512",
+        guidance_scale: float = 7.5,
+        negative_prompt: str = None,
+        seed: int = None,
+        num_inference_steps: int = 50,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate image from text prompt
+
+        Args:
+            prompt: Text description of desired image
+            size: Image dimensions (e.g., "512x512")
+            guidance_scale: How closely to follow the prompt
+            negative_prompt: What to avoid in the image
+            seed: Random seed for reproducibility
+            num_inference_steps: Number of denoising steps
+            timeout: Seconds before giving up (defaults to self.timeout)
+
+        Returns:
+            Dictionary with success status, image data, or error message
+        """
+        timeout = timeout or self.timeout
+        model = self.model  # Metrics label until the request is routed
+        try:
+            width, height = map(int, size.split("x"))
+            seeded = seed is not None
+            params = self.generation_params(prompt, width, height, guidance_scale, negative_prompt,
+                                            seed if seeded else self.random_seed(), num_inference_steps)
+            # Route first, then look up and share by the routed model (see ImageGenerator.generate_image)
+            models = self.route_seeded(params) if seeded else self.router.route(width, height)
+            model = models[0]
+            return await asyncio.wait_for(self._generate_image(params, models, seeded), timeout)
+        except asyncio.TimeoutError:
+            metrics.increment("generations", model=model, size=size, outcome="timeout")
+            return timeout_error(timeout)
+        except Exception as e:
+            metrics.increment("generations", model=model, size=size, outcome="error")
+            return generation_error(e)
+
+    async def _generate_image(self, params: Dict[str, Any], models: List[str], seeded: bool) -> Dict[str, Any]:
+        # A random seed is unique: nothing to look up or share
+        if not seeded:
+            return await self._generate(params, models=models)
+
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.load_generation, params, models)
+            if cached is not None:
+                return cached
+
+        params = {**params, "model": models[0]}
+        result, shared = await self.single_flight.do(ResultCache.make_key(**params),
+                                                     lambda: self._generate(params, models=models))
+        # Waiters get their own dict around the same image
+        if shared:
+            metrics.increment("generations", model=result["generation"]["model"],
+                              size=f"{params['width']}x{params['height']}", outcome="coalesced")
+            return result.copy()
+        return result
+
+    async def _generate(self, params: Dict[str, Any], models: Optional[List[str]] = None) -> Dict[str, Any]:
+        image, model = await self._text_to_image(models=models, **params)
+        return await asyncio.to_thread(self._finish_generation, {**params, "model": model}, image)
+
+    async def replay(self, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Serve a past generation again from its recorded parameters (see ImageGenerator.replay)"""
+        model = params.get("model")
+        if model not in self.router.names:
+            return {"success": False, "error": f"❌ Error: {model} is no longer in the model registry"}
+        timeout = timeout or self.timeout
+        try:
+            return await asyncio.wait_for(self._replay(params, model), timeout)
+        except asyncio.TimeoutError:
+            return timeout_error(timeout)
+        except Exception as e:
+            metrics.increment("generations", model=model, size=f"{params['width']}x{params['height']}",
+                              outcome="error")
+            return generation_error(e)
+
+    async def _replay(self, params: Dict[str, Any], model: str) -> Dict[str, Any]:
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.load_generation, params)
+            if cached is not None:
+                return cached
+        result, shared = await self.single_flight.do(ResultCache.make_key(**params),
+                                                     lambda: self._generate(params, models=[model]))
+        return result.copy() if shared else result
+
+    async def generate_draft(
+        self,
+        prompt: str,
+        size: str = "512x512",
+        guidance_scale: float = 7.5,
+        negative_prompt: str = None,
+        seed: int = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Quick low-resolution, low-step preview (see ImageGenerator.generate_draft)"""
+        try:
+            draft_size, draft_steps = self.draft_params(size)
+        except ValueError as e:
+            return generation_error(e)
+        result = await self.generate_image(
+            prompt=prompt,
+            size=draft_size,
+            guidance_scale=guidance_scale,
+            negative_prompt=negative_prompt,
+            seed=seed,  # Without one, drawn on the unseeded path; the result reports it
+            num_inference_steps=draft_steps,
+            timeout=timeout
+        )
+        if result["success"]:
+            metrics.increment("drafts", model=result["generation"]["model"], outcome="drafted")
+        return result
+
+    async def refine(
+        self,
+        draft: Dict[str, Any],
+        size: str = "512x512",
+        num_inference_steps: int = 50,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Render the final image of an accepted draft (see ImageGenerator.refine)"""
+        try:
+            params = self.refine_params(draft, size, num_inference_steps)
+        except ValueError as e:
+            return generation_error(e)
+        result = await self.replay(params, timeout=timeout)
+        if result["success"]:
+            metrics.increment("drafts", model=params["model"], outcome="refined")
+        return result
+
+    async def iter_batch(
+        self,
+        prompt: str,
+        count: int = 4,
+        max_workers: int = None,
+        **kwargs
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Generate multiple images concurrently, yielding each as it finishes
+
+        Args:
+            prompt: Text description of desired image
+            count: Number of variations to generate
+            max_workers: Per-batch concurrency limit; by default every
+                variation is started at once, within max_concurrency
+            **kwargs: Passed through to generate_image (including timeout)
+
+        Yields:
+            (index, result) pairs in completion order, where index is the
+            position of the variation in the batch. Every result carries
+            a "duration" in seconds; successful ones carry their random "seed".
+            Variations still running when the caller stops iterating are
+            cancelled.
+        """
+        limit = asyncio.Semaphore(max_workers) if max_workers else nullcontext()
+
+        async def run(idx):
+            async with limit:
+                # Unseeded, so the fresh random seed skips the cache lookup
+                start = time.perf_counter()
+                result = await self.generate_image(prompt=prompt, **kwargs)
+                result["duration"] = time.perf_counter() - start
+                return idx, result
+
+        tasks = [asyncio.ensure_future(run(idx)) for idx in range(count)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate_batch(
+        self,
+        prompt: str,
+        count: int = 4,
+        max_workers: int = None,
+        **kwargs
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate multiple images with different seeds concurrently
+
+        Returns:
+            One result dictionary per seed, in seed order. Failed or timed-out
+            requests keep their slot with an error, so partial batches are
+            returned.
+        """
+        results = [None] * count
+        async for idx, result in self.iter_batch(prompt, count=count, max_workers=max_workers, **kwargs):
+            results[idx] = result
+        return results
+
+    async def image_to_image(
+        self,
+        prompt: str,
+        init_image: Image.Image,
+        strength: float = 0.75,
+        guidance_scale: float = 7.5,
+        negative_prompt: str = None,
+        blend_mode: str = "normal",
+        mask: Optional[Image.Image] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate image from an initial image and prompt using style transfer
+
+        Same arguments as ImageGenerator.image_to_image, plus timeout.
+
+        Returns:
+            Dictionary with success status, image data, or error message
+        """
+        timeout = timeout or self.timeout
+        try:
+            return await asyncio.wait_for(
+                self._image_to_image(prompt, init_image, strength, guidance_scale, negative_prompt, blend_mode, mask),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            return timeout_error(timeout)
+        except Exception as e:
+            return style_transfer_error(e)
+
+    async def _image_to_image(
+        self,
+        prompt: str,
+        init_image: Image.Image,
+        strength: float,
+        guidance_scale: float,
+        negative_prompt: Optional[str],
+        blend_mode: str,
+        mask: Optional[Image.Image]
+    ) -> Dict[str, Any]:
+        # FLUX has no img2img: generate from the prompt and blend with the original
+        width, height = style_request_size(*init_image.size)
+        result_image, _ = await self._text_to_image(
+            prompt=prompt,
+            width=width,
+            height=height,
+            guidance_scale=guidance_scale,
+            negative_prompt=negative_prompt
+        )
+
+        if strength < 1.0 or blend_mode != "normal" or mask is not None:
+            def blend():
+                with metrics.timer("blend", mode=blend_mode, size=f"{init_image.width}x{init_image.height}"):
+                    return self.blender.blend(init_image, result_image, strength, blend_mode, mask)
+            result_image = await asyncio.to_thread(blend)
+
+        return self.encoder.build_result(
+            result_image,
+            timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
+            width=result_image.width,
+            height=result_image.height
+        )
@@ -0,0 +1,335 @@
+"""Headless bulk generation: stream prompts from a file into images and a manifest
+
+Usage:
+    python -m src.bulk_generate prompts.jsonl --out results/ [--style Anime] [--concurrency 4]
+    cat prompts.txt | python -m src.bulk_generate - --format txt --out results/
+
+Rerun the same command to resume after a crash or Ctrl-C: prompts already
+in the checkpoint are skipped, and prompts that failed because the model was
+loading or rate-limited are tried again.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+from src.prompt_enhancer import PromptEnhancer
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield input records one at a time, without reading the whole input
+
+    Args:
+        stream: Open text stream
+        fmt: "jsonl" (one object, or a bare prompt string, per line), "csv"
+            (with a header row naming the columns) or "txt" (one prompt per
+            line)
+
+    Besides "prompt", records may set "id", "style", "size",
+    "negative_prompt", "seed", "guidance_scale" and "num_inference_steps".
+    Lines that can't be parsed are yielded as {"error": ...} so they are
+    reported in the manifest rather than stopping the run.
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {k: v for k, v in row.items() if k and v not in (None, "")}
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if fmt == "txt":
+            yield {"prompt": line}
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield {"error": f"Invalid JSON: {e}"}
+            continue
+        if isinstance(record, str):
+            yield {"prompt": record}
+        elif isinstance(record, dict):
+            yield record
+        else:
+            yield {"error": "Expected an object or a prompt string"}
+
+def detect_format(path: str) -> str:
+    """Input format from the file extension; stdin is read as JSON Lines"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if path == "-" or extension in (".jsonl", ".json", ".ndjson"):
+        return "jsonl"
+    return "txt"
+
+class Checkpoint:
+    """
+    Resume point for a run over a numbered input stream
+
+    Records finish out of order, so the checkpoint is a low-water mark
+    (every index below `next` is done) plus the indexes finished above it.
+    The latter never hold more than the number of records in flight, so
+    the checkpoint stays small however long the input is. Records that
+    failed for a transient reason are finished for this run but kept in
+    `failed`, so the next run tries them again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.next = 0
+        self.done = set()
+        self.failed = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.next = state["next"]
+            self.done = set(state["done"])
+            self.failed = set(state.get("failed", []))
+
+    def is_done(self, index: int) -> bool:
+        return index not in self.failed and (index < self.next or index in self.done)
+
+    def mark_done(self, index: int, save: bool = True, retry: bool = False):
+        """Record a finished index and advance the low-water mark past it; retry=True leaves it for the next run"""
+        if retry:
+            self.failed.add(index)
+        else:
+            self.failed.discard(index)
+        if index >= self.next:
+            self.done.add(index)
+        while self.next in self.done:
+            self.done.remove(self.next)
+            self.next += 1
+        if save:
+            self.save()
+
+    def save(self):
+        """Atomically write the checkpoint"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"next": self.next, "done": sorted(self.done), "failed": sorted(self.failed)}, f)
+        os.replace(tmp_path, self.path)
+
+class BulkRunner:
+    """
+    Generate one image per input record with bounded concurrency
+
+    Records are pulled from the input only as workers free up, and each
+    image is written to disk and dropped as soon as it finishes, so memory
+    depends on `concurrency`, not on the size of the input. Every finished
+    record (success or failure) is appended to manifest.jsonl in the output
+    directory and then checkpointed; a rerun over the same input skips
+    everything the checkpoint or manifest already covers, except records
+    that failed because the model was loading, rate-limited or timed out.
+    Those are generated again and get a new manifest entry; the last entry
+    for an index is the one that counts.
+
+    Args:
+        generator: ImageGenerator used for every record
+        out_dir: Directory for images/, manifest.jsonl and checkpoint.json
+        concurrency: Generations in flight at once
+        style: PromptEnhancer style applied to records without their own
+        add_quality: Append PromptEnhancer's quality keywords
+        negative_prompt: Default negative prompt
+        size: Default image size, e.g. "512x512"
+        seed: Base seed; record i without its own seed uses seed + i, so a
+            rerun reproduces the same images. Random seeds when None.
+        generate_kwargs: Other defaults passed to generate_image
+    """
+
+    def __init__(
+        self,
+        generator,
+        out_dir: str,
+        concurrency: int = 4,
+        style: Optional[str] = None,
+        add_quality: bool = True,
+        negative_prompt: Optional[str] = None,
+        size: str = "512x512",
+        seed: Optional[int] = None,
+        **generate_kwargs
+    ):
+        self.generator = generator
+        self.out_dir = out_dir
+        self.image_dir = os.path.join(out_dir, "images")
+        self.manifest_path = os.path.join(out_dir, "manifest.jsonl")
+        self.concurrency = max(1, concurrency)
+        self.style = style
+        self.add_quality = add_quality
+        self.negative_prompt = negative_prompt
+        self.size = size
+        self.seed = seed
+        self.generate_kwargs = generate_kwargs
+        os.makedirs(self.image_dir, exist_ok=True)
+        self.checkpoint = Checkpoint(os.path.join(out_dir, "checkpoint.json"))
+        self._recover_from_manifest()
+
+    def _recover_from_manifest(self):
+        """Count records that reached the manifest but not the checkpoint before a crash"""
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            line = ""
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    index = entry["index"]
+                except (ValueError, KeyError, TypeError):
+                    continue  # Torn last line from the crash
+                if not self.checkpoint.is_done(index):
+                    self.checkpoint.mark_done(index, save=False, retry=entry.get("retryable", False))
+        if line and not line.endswith("\n"):
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write("\n")  # Keep new entries off the torn line
+        self.checkpoint.save()
+
+    def run(self, records: Iterable[Dict[str, Any]], progress: Optional[TextIO] = sys.stderr) -> Dict[str, int]:
+        """
+        Generate every record not done yet
+
+        Returns:
+            Counts of succeeded, failed and skipped (already done) records
+        """
+        counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+        start = time.perf_counter()
+
+        def finish(future):
+            entry = future.result()
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+            self.checkpoint.mark_done(entry["index"], retry=entry.get("retryable", False))
+            counts["succeeded" if entry["success"] else "failed"] += 1
+            if progress is not None:
+                finished = counts["succeeded"] + counts["failed"]
+                progress.write(f"\r{finished} done, {counts['failed']} failed, "
+                               f"{finished / (time.perf_counter() - start):.2f}/s")
+                progress.flush()
+
+        with open(self.manifest_path, 'a', encoding='utf-8') as manifest, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = set()
+            try:
+                for index, record in enumerate(records):
+                    if self.checkpoint.is_done(index):
+                        counts["skipped"] += 1
+                        continue
+                    # Keep the workers busy but never read far ahead of them
+                    while len(pending) >= self.concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finish(future)
+                    pending.add(pool.submit(self.generate_record, index, record))
+                for future in pending:
+                    finish(future)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        if progress is not None:
+            progress.write("\n")
+        return counts
+
+    def generate_record(self, index: int, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate one record and write its image; returns its manifest entry"""
+        entry = {"index": index, **{k: record[k] for k in ("id", "prompt") if k in record}}
+        try:
+            if "error" in record:
+                raise ValueError(record["error"])
+            if not str(record.get("prompt", "")).strip():
+                raise ValueError("Record has no prompt")
+            style = record.get("style", self.style)
+            prompt = PromptEnhancer.enhance_prompt(str(record["prompt"]), style=style, add_quality=self.add_quality)
+            if "seed" in record:
+                seed = int(record["seed"])
+            elif self.seed is not None:
+                seed = (self.seed + index) % 2147483648
+            else:
+                seed = None  # Drawn by the generator without a cache lookup
+            kwargs = dict(self.generate_kwargs)
+            if "guidance_scale" in record:
+                kwargs["guidance_scale"] = float(record["guidance_scale"])
+            if "num_inference_steps" in record:
+                kwargs["num_inference_steps"] = int(record["num_inference_steps"])
+            size = record.get("size", self.size)
+            negative_prompt = record.get("negative_prompt", self.negative_prompt)
+        except (ValueError, TypeError) as e:
+            return {**entry, "success": False, "error": f"❌ Error: {e}"}
+
+        entry.update(style=style, final_prompt=prompt, size=size, seed=seed)
+        start = time.perf_counter()
+        result = self.generator.generate_image(
+            prompt=prompt, size=size, negative_prompt=negative_prompt, seed=seed, **kwargs
+        )
+        entry["duration"] = round(time.perf_counter() - start, 3)
+        if not result["success"]:
+            return {**entry, "success": False, "error": result["error"], "retryable": result.get("retryable", False)}
+
+        seed = entry["seed"] = result["seed"]
+        file_name = f"{index:06d}_{seed}.{result['extension']}"
+        tmp_path = os.path.join(self.image_dir, f".{file_name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(result["image_bytes"])
+        os.replace(tmp_path, os.path.join(self.image_dir, file_name))
+        return {**entry, "success": True, "file": f"images/{file_name}", "generation": result.get("generation")}
+
+def main():
+    from dotenv import load_dotenv
+
+    from src.config import Config
+    from src.http_pool import configure_http_pool
+    from src.image_generator import ImageGenerator
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="Prompt file (.jsonl, .csv or one prompt per line), or - for stdin")
+    parser.add_argument("--out", required=True, help="Output directory for images, manifest and checkpoint")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv", "txt"], default="auto",
+                        help="Input format (default: from the file extension; stdin is JSON Lines)")
+    parser.add_argument("--concurrency", type=int, help="Generations in flight (default: BATCH_CONCURRENCY)")
+    parser.add_argument("--style", choices=sorted(PromptEnhancer.STYLE_TEMPLATES), help="Default style preset")
+    parser.add_argument("--no-quality", action="store_true", help="Don't append quality keywords to prompts")
+    parser.add_argument("--negative-defaults", action="store_true", help="Use the default negative prompt")
+    parser.add_argument("--size", default="512x512", help="Default image size")
+    parser.add_argument("--steps", type=int, default=50, help="Default inference steps")
+    parser.add_argument("--guidance", type=float, default=7.5, help="Default guidance scale")
+    parser.add_argument("--seed", type=int, help="Base seed; record i uses seed + i (default: random seeds)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        config = Config()
+    except ValueError as e:
+        sys.exit(str(e))
+    configure_http_pool(max_connections=config.http_max_connections, keepalive_expiry=config.http_keepalive_expiry)
+
+    runner = BulkRunner(
+        ImageGenerator.from_config(config),
+        args.out,
+        concurrency=args.concurrency or config.batch_concurrency,
+        style=args.style,
+        add_quality=not args.no_quality,
+        negative_prompt=PromptEnhancer.get_negative_prompt() if args.negative_defaults else None,
+        size=args.size,
+        seed=args.seed,
+        guidance_scale=args.guidance,
+        num_inference_steps=args.steps
+    )
+    fmt = detect_format(args.input) if args.format == "auto" else args.format
+    stream = sys.stdin if args.input == "-" else open(args.input, 'r', encoding='utf-8', newline='')
+    try:
+        counts = runner.run(read_records(stream, fmt))
+    except KeyboardInterrupt:
+        sys.exit(f"\nInterrupted; rerun the same command to resume from {runner.checkpoint.path}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print(f"{counts['succeeded']} succeeded, {counts['failed']} failed, {counts['skipped']} already done; "
+          f"manifest: {runner.manifest_path}")
+    if counts["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,34 @@
 import os
 from typing import Optional
 
+from src.model_router import DEFAULT_MODELS, parse_models
+
 class Config:
     """Configuration management for the application"""
     
     def __init__(self):
         self.api_key = self._load_api_key()
-        self.api_url = "https://api-inference.huggingface.co/models/runwayml/stable-diffusion-v1-5"
+        self.models = parse_models(os.getenv("IMAGE_MODELS", DEFAULT_MODELS))
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "4"))
+        self.job_workers = int(os.getenv("JOB_WORKERS", "4"))
+        self.job_max_pending = int(os.getenv("JOB_QUEUE_MAX_PENDING", "100"))
+        self.cache_dir = os.getenv("RESULT_CACHE_DIR", ".image_cache")
+        self.cache_max_bytes = int(os.getenv("RESULT_CACHE_MAX_MB", "512")) * 1024 * 1024
+        self.output_format = os.getenv("OUTPUT_FORMAT", "PNG")
+        self.output_quality = int(os.getenv("OUTPUT_QUALITY", "90"))
+        self.png_compress_level = int(os.getenv("PNG_COMPRESS_LEVEL", "6"))
+        self.rate_limit_per_minute = float(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+        self.rate_limit_burst = int(os.getenv("RATE_LIMIT_BURST", "6"))
+        self.max_retries = int(os.getenv("MAX_RETRIES", "5"))
+        self.retry_max_wait = float(os.getenv("RETRY_MAX_WAIT_SECONDS", "120"))
+        self.http_max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+        self.http_keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "120"))
+        self.blend_precision = os.getenv("BLEND_PRECISION", "uint8")
+        self.blend_tile_rows = int(os.getenv("BLEND_TILE_ROWS", "64"))
+        self.draft_steps = int(os.getenv("DRAFT_STEPS", "8"))
+        self.draft_scale = float(os.getenv("DRAFT_SCALE", "0.5"))
+        self.upload_max_side = int(os.getenv("UPLOAD_MAX_SIDE", "2048"))
+        self.upload_max_pixels = int(float(os.getenv("UPLOAD_MAX_MEGAPIXELS", "50")) * 1_000_000)
     
     def _load_api_key(self) -> str:
         """Load API key from environment variable"""
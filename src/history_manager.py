@@ -1,35 +1,49 @@
 """Manage generation history"""
-import json
-import os
+import threading
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from src.history_store import JsonlHistoryStore, SQLiteHistoryStore
+from src.metrics import metrics
+from src.running_stats import RunningStats
 
 class HistoryManager:
     """Manage image generation history"""
     
-    def __init__(self, history_file: str = "generation_history.json"):
-        self.history_file = history_file
-        self.history = self._load_history()
-    
-    def _load_history(self) -> List[Dict]:
-        """Load history from file"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+    STATS_SAVE_EVERY = 1000  # Entries counted between saves of the statistics
     
-    def _save_history(self):
-        """Save history to file"""
-        try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.history, f, indent=2)
-        except Exception as e:
-            print(f"Error saving history: {e}")
+    def __init__(
+        self,
+        history_file: Optional[str] = None,
+        legacy_file: Optional[str] = "generation_history.json",
+        backend: str = "jsonl",
+        fsync: bool = True
+    ):
+        if backend == "jsonl":
+            self.store = JsonlHistoryStore(history_file or "generation_history.jsonl", legacy_file, fsync=fsync)
+        elif backend == "sqlite":
+            self.store = SQLiteHistoryStore(
+                history_file or "generation_history.db",
+                legacy_paths=[legacy_file, "generation_history.jsonl"],
+                fsync=fsync
+            )
+        else:
+            raise ValueError(f"Unknown history backend: {backend}")
+        self.history_file = self.store.path
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = RunningStats()  # Caught up with the store on every read
+        self._cursor = None  # Store position the stats have seen up to
+        self._unsaved = 0  # Entries counted since the stats were last saved to the store
     
-    def add_generation(self, prompt: str, settings: Dict, success: bool = True):
+    def add_generation(
+        self,
+        prompt: str,
+        settings: Dict,
+        success: bool = True,
+        error: Optional[str] = None,
+        duration: Optional[float] = None
+    ):
         """Add a generation to history"""
         entry = {
             "timestamp": datetime.now().isoformat(),
@@ -37,26 +51,50 @@ class HistoryManager:
             "settings": settings,
             "success": success
         }
-        self.history.append(entry)
-        self._save_history()
+        if error is not None:
+            entry["error"] = error
+        if duration is not None:
+            entry["duration"] = duration
+        
+        # Not under self._lock: the store group-commits concurrent appends
+        with metrics.timer("history_write", backend=self.backend):
+            self.store.append(entry)
     
-    def get_recent(self, limit: int = 10) -> List[Dict]:
-        """Get recent generations"""
-        return self.history[-limit:][::-1]
+    def get_recent(self, limit: int = 10, offset: int = 0, prompt_filter: Optional[str] = None) -> List[Dict]:
+        """Get recent generations, newest first"""
+        return self.store.recent(limit=limit, offset=offset, prompt_filter=prompt_filter)
     
     def get_stats(self) -> Dict:
-        """Get generation statistics"""
-        total = len(self.history)
-        successful = sum(1 for h in self.history if h.get("success", False))
-        
-        return {
-            "total_generations": total,
-            "successful": successful,
-            "failed": total - successful,
-            "success_rate": (successful / total * 100) if total > 0 else 0
-        }
+        """
+        Get generation statistics from the running counters
+
+        Only entries added since the last call are read, including those
+        written by other processes sharing the history file. The first call
+        starts from the statistics saved in the store, when it keeps them,
+        so it reads only what was added after they were saved.
+        """
+        with self._lock:
+            if self._cursor is None:
+                saved = self.store.load_stats()
+                if saved is not None:
+                    self._cursor, state = saved
+                    self._stats.restore(state)
+            while True:
+                self._cursor, entries, reset = self.store.changes(self._cursor)
+                if reset:
+                    self._stats.reset()
+                    self._unsaved = 0
+                for entry in entries:
+                    self._stats.record(entry)
+                self._unsaved += len(entries)
+                if not entries:
+                    break
+            if self._unsaved >= self.STATS_SAVE_EVERY:
+                self.store.save_stats(self._cursor, self._stats.state())
+                self._unsaved = 0
+            return self._stats.snapshot()
     
     def clear_history(self):
         """Clear all history"""
-        self.history = []
-        self._save_history()
+        with self._lock:
+            self.store.clear()
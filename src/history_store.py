@@ -0,0 +1,516 @@
+"""Storage backends for generation history"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Iterator, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so use one process per history file
+    fcntl = None
+
+def _matches(entry: Dict, prompt_filter: Optional[str]) -> bool:
+    return not prompt_filter or prompt_filter.lower() in entry.get("prompt", "").lower()
+
+def _read_entries(path: str) -> List[Dict]:
+    """Read a history file in either the legacy JSON or the JSON Lines format"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith(".jsonl"):
+                return [json.loads(line) for line in f if line.strip()]
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except (OSError, ValueError) as e:
+        print(f"Error loading history from {path}: {e}")
+        return []
+
+def _parse_lines(data: bytes) -> Tuple[List[Dict], int]:
+    """Parse complete JSON lines; return the entries and how many lines were corrupt"""
+    entries, corrupt = [], 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            corrupt += 1
+    return entries, corrupt
+
+class _Pending:
+    __slots__ = ("item", "done", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = False
+        self.error = None
+
+class _GroupCommit:
+    """Batch concurrent writes so that many callers share one flush
+
+    The first caller to arrive writes everything queued so far. Callers
+    arriving while that write (and its fsync) is in progress queue up and
+    are written together by the next of them, so under load one fsync
+    covers many appends, while a lone append is never held back by a timer.
+    Each caller returns once its own entry is durable, or raises the error
+    its batch failed with.
+    """
+
+    def __init__(self, flush: Callable[[List], None]):
+        self._flush = flush
+        self._cond = threading.Condition()
+        self._queue: List[_Pending] = []
+        self._flushing = False
+        self.appends = 0
+        self.commits = 0
+
+    def submit(self, item):
+        pending = _Pending(item)
+        with self._cond:
+            self._queue.append(pending)
+            while not pending.done:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                batch, self._queue = self._queue, []
+                self._flushing = True
+                self._cond.release()
+                error = None
+                try:
+                    self._flush([p.item for p in batch])
+                except Exception as e:
+                    error = e
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                for p in batch:
+                    p.done, p.error = True, error
+                self.appends += len(batch)
+                self.commits += 1
+                self._cond.notify_all()
+        if pending.error is not None:
+            raise pending.error
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {"appends": self.appends, "commits": self.commits}
+
+class JsonlHistoryStore:
+    """Append-only JSON Lines history log, safe to share between processes
+
+    Each generation is one line, so an append costs the same no matter how
+    long the history is. Every write takes an advisory lock on a sidecar
+    `.lock` file, and concurrent appends are group-committed: one write and
+    one fsync per batch. The log is compacted (rewritten to a temporary
+    file and renamed over the original) only when it needs repair: torn or
+    corrupt lines from a crash, or entries migrated from the legacy
+    single-document JSON file.
+
+    Entries are read on first use and then kept current by reading only
+    what other processes appended since; a log replaced by another process
+    is detected and reloaded.
+    """
+
+    def __init__(
+        self,
+        path: str = "generation_history.jsonl",
+        legacy_path: Optional[str] = "generation_history.json",
+        fsync: bool = True
+    ):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync = fsync
+        self.lock_path = f"{path}.lock"
+        self._entries = None  # Read on first use; appends don't need them
+        self._reader = None  # Open handle on the log that was read, to notice when it is replaced
+        self._offset = 0  # Bytes of the log already parsed
+        self._epoch = 0  # Bumped whenever entries are reloaded from scratch
+        self._read_lock = threading.Lock()
+        self._commits = _GroupCommit(self._write_batch)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold the exclusive advisory lock shared by every process writing this log"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @property
+    def entries(self) -> List[Dict]:
+        """All entries, oldest first, including those appended by other processes"""
+        with self._read_lock:
+            self._refresh()
+            return self._entries
+
+    def _refresh(self):
+        """Bring entries up to date with the log on disk"""
+        if self._entries is None:
+            self.load()
+            return
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        if (current is None or self._reader is None
+                or not os.path.samestat(current, os.fstat(self._reader.fileno()))
+                or current.st_size < self._offset):
+            self.load()  # Compacted or cleared by another process
+        elif current.st_size > self._offset:
+            self._reader.seek(self._offset)
+            data = self._reader.read()
+            complete = data.rfind(b"\n") + 1  # A trailing partial line is still being written
+            entries, _ = _parse_lines(data[:complete])
+            self._entries.extend(entries)
+            self._offset += complete
+
+    def load(self) -> List[Dict]:
+        """Load all entries, migrating legacy JSON and dropping corrupt lines"""
+        with self._file_lock():
+            entries = []
+            needs_compaction = False
+
+            migrating = bool(self.legacy_path) and os.path.exists(self.legacy_path)
+            if migrating:
+                entries.extend(_read_entries(self.legacy_path))
+                needs_compaction = True
+
+            data = b""
+            if os.path.exists(self.path):
+                with open(self.path, 'rb') as f:
+                    data = f.read()
+            logged, corrupt = _parse_lines(data)
+            entries.extend(logged)
+            # No writer holds the lock, so a line without its newline is torn
+            needs_compaction = needs_compaction or corrupt > 0 or (data and not data.endswith(b"\n"))
+
+            try:
+                if needs_compaction:
+                    self._rewrite(entries)
+                    if migrating:
+                        os.replace(self.legacy_path, f"{self.legacy_path}.bak")
+                elif not data:
+                    open(self.path, 'ab').close()  # So there is a file to follow
+            except OSError as e:
+                print(f"Error compacting history: {e}")
+
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            if os.path.exists(self.path):
+                self._reader = open(self.path, 'rb')
+                self._offset = os.fstat(self._reader.fileno()).st_size
+        self._entries = entries
+        self._epoch += 1
+        return entries
+
+    def append(self, entry: Dict):
+        """Append one entry to the end of the log, returning once it is written"""
+        try:
+            self._commits.submit(entry)
+        except Exception as e:
+            print(f"Error saving history: {e}")
+
+    def _write_batch(self, entries: List[Dict]):
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        with self._file_lock(), open(self.path, 'a+b') as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data  # Keep a torn line from a crashed writer off our first entry
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def commit_stats(self) -> Dict:
+        """Appends and the group commits (writes plus fsyncs) that carried them"""
+        return self._commits.stats()
+
+    def recent(self, limit: int = 10, offset: int = 0, prompt_filter: Optional[str] = None) -> List[Dict]:
+        """Get entries newest first, optionally filtered by prompt substring"""
+        entries = self.entries
+        if not prompt_filter:
+            end = len(entries) - offset
+            return entries[max(end - limit, 0):max(end, 0)][::-1]
+        matches = [e for e in reversed(entries) if _matches(e, prompt_filter)]
+        return matches[offset:offset + limit]
+
+    def iter_entries(self) -> Iterator[Dict]:
+        """Iterate over all entries, oldest first"""
+        return iter(list(self.entries))
+
+    def changes(self, cursor: Optional[Tuple] = None, limit: int = 1000) -> Tuple[Tuple, List[Dict], bool]:
+        """
+        Get up to limit entries added after cursor
+
+        Returns:
+            (cursor, entries, reset): the cursor to pass next time, the new
+            entries, and whether the log was rewritten since the given
+            cursor, in which case entries start again from the first one
+        """
+        with self._read_lock:
+            self._refresh()
+            entries, epoch = self._entries, self._epoch
+        reset = cursor is None or cursor[0] != epoch
+        start = 0 if reset else cursor[1]
+        batch = entries[start:start + limit]
+        return (epoch, start + len(batch)), batch, reset
+
+    def load_stats(self) -> Optional[Tuple[Tuple, Dict]]:
+        """Saved statistics; none, as the whole log is read into memory on first use anyway"""
+        return None
+
+    def save_stats(self, cursor: Tuple, state: Dict):
+        """Statistics are not saved for the log (see load_stats)"""
+
+    def _rewrite(self, entries: List[Dict]):
+        """Replace the log with exactly the given entries; the caller holds the file lock"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        if hasattr(os, "O_DIRECTORY"):
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory)  # Make the rename itself durable
+            finally:
+                os.close(directory)
+
+    def compact(self, entries: Optional[List[Dict]] = None):
+        """Atomically rewrite the log with exactly the given entries (default: the current ones)"""
+        try:
+            with self._file_lock():
+                if entries is None:
+                    entries = []
+                    if os.path.exists(self.path):
+                        with open(self.path, 'rb') as f:
+                            entries, _ = _parse_lines(f.read())
+                self._rewrite(entries)
+        except Exception as e:
+            print(f"Error compacting history: {e}")
+
+    def clear(self):
+        """Remove all entries"""
+        self.compact([])
+
+class SQLiteHistoryStore:
+    """SQLite history database with indexed, paged queries
+
+    Statistics are saved in a one-row table together with the last row id
+    they cover, so a new process starts from them and reads only the rows
+    added since rather than the whole table. Nothing is held in memory
+    beyond the connection. SQLite does its own
+    locking between processes; concurrent appends are group-committed into
+    one transaction (and one fsync) per batch, and the database's
+    user_version is bumped on every clear so readers can tell.
+    """
+
+    COLUMNS = "timestamp, prompt, settings, success, error, duration"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            settings TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            error TEXT,
+            duration REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp);
+        CREATE TABLE IF NOT EXISTS history_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            state TEXT NOT NULL
+        );
+    """
+    # Superseded by history_stats; nothing reads them, but inserts still maintained them
+    LEGACY_OBJECTS = {
+        "idx_history_success": "DROP INDEX idx_history_success",
+        "trg_history_count": "DROP TRIGGER trg_history_count",
+        "history_counters": "DROP TABLE history_counters"
+    }
+
+    def __init__(
+        self,
+        path: str = "generation_history.db",
+        legacy_paths: Sequence[str] = (),
+        fsync: bool = True,
+        busy_timeout: float = 30.0
+    ):
+        self.path = path
+        self._lock = threading.Lock()
+        self._commits = _GroupCommit(self._insert_batch)
+        is_new = not os.path.exists(path)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+            self._conn.executescript(self.SCHEMA)
+            self._migrate()
+        if is_new:
+            for legacy_path in legacy_paths:
+                if legacy_path and os.path.exists(legacy_path):
+                    self._import(_read_entries(legacy_path))
+
+    def _migrate(self):
+        """Add columns introduced after the database was created and drop objects no longer used"""
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(history)")}
+        for column, column_type in (("error", "TEXT"), ("duration", "REAL")):
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE history ADD COLUMN {column} {column_type}")
+        # user_version is the clear epoch, so the catalog tells whether this already ran
+        placeholders = ", ".join("?" * len(self.LEGACY_OBJECTS))
+        for row in self._conn.execute(f"SELECT name FROM sqlite_master WHERE name IN ({placeholders})",
+                                      list(self.LEGACY_OBJECTS)).fetchall():
+            self._conn.execute(self.LEGACY_OBJECTS[row["name"]])
+
+    def _import(self, entries: List[Dict]):
+        with self._lock, self._conn:
+            # Processes starting together may all see a new database; only the first imports
+            self._conn.execute("BEGIN IMMEDIATE")
+            if self._conn.execute("SELECT 1 FROM history LIMIT 1").fetchone():
+                return
+            self._conn.executemany(
+                f"INSERT INTO history ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                [self._to_row(e) for e in entries]
+            )
+
+    @staticmethod
+    def _to_row(entry: Dict) -> tuple:
+        return (
+            entry.get("timestamp", ""),
+            entry.get("prompt", ""),
+            json.dumps(entry.get("settings", {})),
+            1 if entry.get("success", False) else 0,
+            entry.get("error"),
+            entry.get("duration")
+        )
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict:
+        entry = {
+            "timestamp": row["timestamp"],
+            "prompt": row["prompt"],
+            "settings": json.loads(row["settings"]),
+            "success": bool(row["success"])
+        }
+        for optional in ("error", "duration"):
+            if row[optional] is not None:
+                entry[optional] = row[optional]
+        return entry
+
+    def append(self, entry: Dict):
+        """Insert one entry, returning once it is committed"""
+        try:
+            self._commits.submit(entry)
+        except sqlite3.Error as e:
+            print(f"Error saving history: {e}")
+
+    def _insert_batch(self, entries: List[Dict]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO history ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                [self._to_row(e) for e in entries]
+            )
+
+    def commit_stats(self) -> Dict:
+        """Appends and the group commits (transactions) that carried them"""
+        return self._commits.stats()
+
+    def recent(self, limit: int = 10, offset: int = 0, prompt_filter: Optional[str] = None) -> List[Dict]:
+        """Get entries newest first, optionally filtered by prompt substring"""
+        query = f"SELECT {self.COLUMNS} FROM history"
+        params = []
+        if prompt_filter:
+            escaped = prompt_filter.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query += " WHERE prompt LIKE ? ESCAPE '\\'"
+            params.append(f"%{escaped}%")
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def iter_entries(self, chunk_size: int = 1000) -> Iterator[Dict]:
+        """Iterate over all entries, oldest first, in bounded-memory chunks"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {self.COLUMNS} FROM history WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._from_row(row)
+            last_id = rows[-1]["id"]
+
+    def changes(self, cursor: Optional[Tuple] = None, limit: int = 1000) -> Tuple[Tuple, List[Dict], bool]:
+        """
+        Get up to limit entries added after cursor
+
+        Returns:
+            (cursor, entries, reset): the cursor to pass next time, the new
+            entries, and whether the history was cleared since the given
+            cursor, in which case entries start again from the first one
+        """
+        with self._lock:
+            epoch = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            reset = cursor is None or cursor[0] != epoch
+            last_id = 0 if reset else cursor[1]
+            rows = self._conn.execute(
+                f"SELECT id, {self.COLUMNS} FROM history WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, limit)
+            ).fetchall()
+        if rows:
+            last_id = rows[-1]["id"]
+        return (epoch, last_id), [self._from_row(row) for row in rows], reset
+
+    def load_stats(self) -> Optional[Tuple[Tuple, Dict]]:
+        """Saved statistics and the changes() cursor they are current up to, or None"""
+        with self._lock:
+            epoch = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            row = self._conn.execute("SELECT epoch, last_id, state FROM history_stats WHERE id = 1").fetchone()
+        if row is None or row["epoch"] != epoch:
+            return None  # Saved before a clear
+        return (row["epoch"], row["last_id"]), json.loads(row["state"])
+
+    def save_stats(self, cursor: Tuple, state: Dict):
+        """Save statistics current up to a changes() cursor, unless newer ones are saved already"""
+        epoch, last_id = cursor
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO history_stats (id, epoch, last_id, state) VALUES (1, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET epoch = excluded.epoch, last_id = excluded.last_id,
+                        state = excluded.state
+                    WHERE excluded.epoch > history_stats.epoch
+                        OR (excluded.epoch = history_stats.epoch AND excluded.last_id > history_stats.last_id)
+                    """,
+                    (epoch, last_id, json.dumps(state))
+                )
+        except sqlite3.Error as e:
+            print(f"Error saving history stats: {e}")
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history")
+            self._conn.execute("DELETE FROM history_stats")
+            epoch = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            self._conn.execute(f"PRAGMA user_version = {epoch + 1}")
@@ -0,0 +1,98 @@
+"""Shared keep-alive HTTP pool for Hugging Face inference calls"""
+import threading
+from typing import Dict
+
+import httpx2
+from huggingface_hub import set_async_client_factory, set_client_factory
+
+class ConnectionStats:
+    """Count requests and newly opened connections to measure keep-alive reuse"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def on_request(self, request: httpx2.Request):
+        """Request event hook: count the request and trace its connection"""
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    def _trace(self, event_name: str, info: Dict):
+        if event_name == "connection.connect_tcp.started":
+            with self._lock:
+                self.new_connections += 1
+
+    async def on_request_async(self, request: httpx2.Request):
+        """Request event hook for async clients"""
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._trace_async
+
+    async def _trace_async(self, event_name: str, info: Dict):
+        self._trace(event_name, info)
+
+    def snapshot(self) -> Dict:
+        """Get request, connection and reuse counts"""
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused": reused,
+                "reuse_rate": (reused / self.requests * 100) if self.requests > 0 else 0
+            }
+
+connection_stats = ConnectionStats()
+_configured = False
+_configure_lock = threading.Lock()
+
+def configure_http_pool(
+    max_connections: int = 32,
+    max_keepalive_connections: int = 16,
+    keepalive_expiry: float = 120.0
+):
+    """
+    Install one pooled HTTP client for every huggingface_hub request in the process
+
+    Only the first call takes effect; later calls keep the existing pool so
+    warm connections are not thrown away. Async clients (one pool per
+    AsyncInferenceClient, as huggingface_hub does not share them) get the
+    same limits.
+
+    Args:
+        max_connections: Upper bound on open connections
+        max_keepalive_connections: Idle connections kept for reuse
+        keepalive_expiry: Seconds an idle connection is kept open
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+
+        limits = httpx2.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+
+        def client_factory() -> httpx2.Client:
+            return httpx2.Client(
+                limits=limits,
+                event_hooks={"request": [connection_stats.on_request]},
+                follow_redirects=True,
+                timeout=None
+            )
+
+        def async_client_factory() -> httpx2.AsyncClient:
+            return httpx2.AsyncClient(
+                limits=limits,
+                event_hooks={"request": [connection_stats.on_request_async]},
+                follow_redirects=True,
+                timeout=None
+            )
+
+        set_client_factory(client_factory)
+        set_async_client_factory(async_client_factory)
+        _configured = True
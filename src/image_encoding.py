@@ -0,0 +1,143 @@
+"""Output encoding for generated images"""
+from io import BytesIO
+from typing import Any, Callable, Optional, Tuple
+
+from PIL import Image
+
+from src.metrics import metrics
+
+FORMATS = {
+    "PNG": {"mime_type": "image/png", "extension": "png"},
+    "JPEG": {"mime_type": "image/jpeg", "extension": "jpg"},
+    "WEBP": {"mime_type": "image/webp", "extension": "webp"}
+}
+
+class ImageEncoder:
+    """
+    Encode images for download, reusing the server's bytes when possible
+
+    Args:
+        output_format: "PNG", "JPEG", "WEBP", or "ORIGINAL" to keep whatever
+            supported format the server returned
+        quality: JPEG/WebP quality (1-100)
+        png_compress_level: zlib level for PNG (0 = fastest, 9 = smallest)
+        passthrough: Reuse the raw response bytes when they already match
+    """
+
+    def __init__(
+        self,
+        output_format: str = "PNG",
+        quality: int = 90,
+        png_compress_level: int = 6,
+        passthrough: bool = True
+    ):
+        output_format = output_format.upper()
+        if output_format != "ORIGINAL" and output_format not in FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.output_format = output_format
+        self.quality = quality
+        self.png_compress_level = png_compress_level
+        self.passthrough = passthrough
+
+    def target_format(self, image: Image.Image) -> str:
+        """Format the given image will be delivered in"""
+        if self.output_format == "ORIGINAL":
+            return image.format if image.format in FORMATS else "PNG"
+        return self.output_format
+
+    def raw_bytes(self, image: Image.Image, response: Optional[Tuple[bytes, str]] = None) -> Optional[bytes]:
+        """Return the undecoded response bytes if they can be served as-is"""
+        response = response or self.response_bytes(image)
+        if self.passthrough and response is not None and response[1] == self.target_format(image):
+            return response[0]
+        return None
+
+    @staticmethod
+    def response_bytes(image: Image.Image) -> Optional[Tuple[bytes, str]]:
+        """The undecoded response bytes and their format, whatever the output format, if there are any"""
+        fp = getattr(image, "fp", None)
+        if isinstance(fp, BytesIO) and image.format in FORMATS:
+            return fp.getvalue(), image.format
+        return None
+
+    def encode(self, image: Image.Image, fmt: Optional[str] = None) -> bytes:
+        """Encode an image with the configured compression settings"""
+        fmt = fmt or self.target_format(image)
+        buf = BytesIO()
+        with metrics.timer("encode", format=fmt, size=f"{image.width}x{image.height}"):
+            if fmt == "PNG":
+                image.save(buf, format="PNG", compress_level=self.png_compress_level)
+            elif fmt == "JPEG":
+                image.convert("RGB").save(buf, format="JPEG", quality=self.quality)
+            else:
+                image.save(buf, format=fmt, quality=self.quality)
+        return buf.getvalue()
+
+    def build_result(
+        self,
+        image: Image.Image,
+        response: Optional[Tuple[bytes, str]] = None,
+        **fields
+    ) -> "GenerationResult":
+        """
+        Build a success result whose image_bytes are produced on first access
+
+        `response` is the image's response_bytes, for images already decoded
+        (decoding releases the response). It is kept on the result either way,
+        see GenerationResult.stored_bytes.
+        """
+        fmt = self.target_format(image)
+        response = response or self.response_bytes(image)
+        raw = self.raw_bytes(image, response)
+        result = GenerationResult(
+            success=True,
+            image=image,
+            mime_type=FORMATS[fmt]["mime_type"],
+            extension=FORMATS[fmt]["extension"],
+            encoder=None if raw is not None else (lambda: self.encode(image, fmt)),
+            response=response,
+            **fields
+        )
+        if raw is not None:
+            result["image_bytes"] = raw
+        return result
+
+class GenerationResult(dict):
+    """Result dictionary that encodes "image_bytes" lazily on first access"""
+
+    def __init__(
+        self,
+        encoder: Optional[Callable[[], bytes]] = None,
+        response: Optional[Tuple[bytes, str]] = None,
+        **fields: Any
+    ):
+        super().__init__(**fields)
+        self._encoder = encoder
+        self.response = response  # Undecoded (bytes, format) from the server, if any
+
+    def __missing__(self, key: str) -> Any:
+        if key == "image_bytes" and self._encoder is not None:
+            self["image_bytes"] = self._encoder()
+            self._encoder = None
+            return self["image_bytes"]
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return super().__contains__(key) or (key == "image_bytes" and self._encoder is not None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def copy(self) -> "GenerationResult":
+        """Shallow copy that keeps encoding lazily"""
+        return GenerationResult(encoder=self._encoder, response=self.response, **self)
+
+    def stored_bytes(self) -> Tuple[bytes, str]:
+        """
+        (bytes, extension) to keep this image on disk: the response as
+        received when there is one, so storing it never forces an encode,
+        otherwise image_bytes
+        """
+        if self.response is not None:
+            return self.response[0], FORMATS[self.response[1]]["extension"]
+        return self["image_bytes"], self["extension"]
@@ -1,18 +1,320 @@
 from huggingface_hub import InferenceClient
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import random
+import time
 
-class ImageGenerator:
+from src.blending import TileBlender
+from src.image_encoding import FORMATS, ImageEncoder
+from src.metrics import metrics
+from src.model_router import DEFAULT_MODELS, ModelRouter, parse_models
+from src.result_cache import ResultCache
+from src.scheduler import RequestScheduler, TokenBucket
+from src.single_flight import SingleFlight
+from src.watermark import Watermarker
+
+def generation_error(error: Exception) -> Dict[str, Any]:
+    """
+    Map a failed text-to-image call to a result dictionary with a user-facing message
+
+    Failures that may go away on their own (model loading, rate limit) are
+    flagged "retryable".
+    """
+    error_msg = str(error)
+    if "Model is currently loading" in error_msg or "loading" in error_msg.lower():
+        return {
+            "success": False,
+            "error": "⏳ Model is loading. Please wait 30-60 seconds and try again.",
+            "retryable": True
+        }
+    elif "rate limit" in error_msg.lower():
+        return {
+            "success": False,
+            "error": "⏱️ Rate limit reached. Please wait a few minutes and try again.",
+            "retryable": True
+        }
+    elif "401" in error_msg or "Invalid" in error_msg or "Unauthorized" in error_msg:
+        return {
+            "success": False, 
+            "error": "🔑 Invalid API token. Please check SETUP_INSTRUCTIONS.md for help getting a valid token."
+        }
+    else:
+        return {"success": False, "error": f"❌ Error: {error_msg}"}
+
+def style_transfer_error(error: Exception) -> Dict[str, Any]:
+    """Map a failed image-to-image call to a result dictionary with a user-facing message"""
+    error_msg = str(error)
+    if "loading" in error_msg.lower():
+        return {"success": False, "error": "⏳ Model is loading. Please wait and try again."}
+    elif "rate limit" in error_msg.lower():
+        return {"success": False, "error": "⏱️ Rate limit reached. Please wait a moment."}
+    else:
+        return {"success": False, "error": f"❌ Error: {error_msg}"}
+
+def style_request_size(width: int, height: int, max_size: int = 768) -> Tuple[int, int]:
+    """
+    Size to request from the model for an image-to-image input
+    
+    At most max_size px on the long side and multiples of 8 (required by
+    the model); the blend itself runs at the original resolution.
+    """
+    if max(width, height) > max_size:
+        ratio = max_size / max(width, height)
+        width = int(width * ratio)
+        height = int(height * ratio)
+    return (width // 8) * 8, (height // 8) * 8
+
+def draft_request_size(width: int, height: int, scale: float = 0.5, min_side: int = 256) -> Tuple[int, int]:
+    """
+    Size of a quick preview for a requested size
+    
+    The same aspect ratio at `scale`, but not below min_side px on the
+    short side (nor above the requested size), in multiples of 8.
+    """
+    ratio = min(max(scale, min_side / min(width, height)), 1.0)
+    return max(8, int(width * ratio) // 8 * 8), max(8, int(height * ratio) // 8 * 8)
+
+class BaseImageGenerator:
+    """Models, storage, encoding, blending and watermarking shared by the sync and async generators"""
+    
+    def __init__(
+        self,
+        max_workers: int = 4,
+        cache: Optional[ResultCache] = None,
+        encoder: Optional[ImageEncoder] = None,
+        blender: Optional[TileBlender] = None,
+        watermarker: Optional[Watermarker] = None,
+        router: Optional[ModelRouter] = None,
+        draft_steps: int = 8,
+        draft_scale: float = 0.5
+    ):
+        self.max_workers = max_workers  # Concurrent requests per batch
+        self.cache = cache  # Stored results by generation parameters, served again without inference
+        self.encoder = encoder or ImageEncoder()  # Download format, encoded lazily
+        self.blender = blender or TileBlender()  # Full-resolution image-to-image blending
+        self.watermarker = watermarker or Watermarker(max_workers=max_workers)
+        self.router = router or ModelRouter(parse_models(DEFAULT_MODELS))  # Model registry and fallback
+        self.draft_steps = draft_steps  # Inference steps of a draft preview
+        self.draft_scale = draft_scale  # Draft size relative to the requested size
+    
+    @property
+    def model(self) -> str:
+        """Preferred model of the registry (requests may be routed elsewhere)"""
+        return self.router.primary
+    
+    @staticmethod
+    def random_seed() -> int:
+        """Pick a random seed in the range the API accepts"""
+        return random.randint(0, 2147483647)
+    
+    def generation_params(
+        self,
+        prompt: str,
+        width: int,
+        height: int,
+        guidance_scale: float,
+        negative_prompt: Optional[str],
+        seed: int,
+        num_inference_steps: int
+    ) -> Dict[str, Any]:
+        """
+        Everything that determines a text-to-image result
+
+        The same parameters always produce the same image, so their hash
+        is the result cache key and the dictionary is what history records
+        to serve or regenerate a past image.
+        """
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "width": width,
+            "height": height,
+            "guidance_scale": guidance_scale,
+            "negative_prompt": negative_prompt,
+            "seed": seed,
+            "num_inference_steps": num_inference_steps
+        }
+    
+    def draft_params(self, size: str) -> Tuple[str, int]:
+        """Size and steps of the draft for a requested size"""
+        width, height = map(int, size.split("x"))
+        draft_width, draft_height = draft_request_size(width, height, self.draft_scale)
+        return f"{draft_width}x{draft_height}", self.draft_steps
+    
+    @staticmethod
+    def refine_params(draft: Dict[str, Any], size: str, num_inference_steps: int) -> Dict[str, Any]:
+        """Generation parameters of the final render of a draft: same model, prompt, settings and seed"""
+        width, height = map(int, size.split("x"))
+        return {**draft, "width": width, "height": height, "num_inference_steps": num_inference_steps}
+    
+    def route_seeded(self, params: Dict[str, Any]) -> List[str]:
+        """
+        Models for a request with a chosen seed, best first
+        
+        Such requests are never routing probes, so the same request goes
+        to the same model while it is healthy and can be served from storage.
+        """
+        return self.router.route(params["width"], params["height"], probe=False)
+    
+    def load_generation(self, params: Dict[str, Any], models: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Result for generation_params from the result cache, or None if it isn't stored
+        
+        With models, the result of the first of them that has one stored for
+        the other parameters.
+        """
+        if self.cache is None:
+            return None
+        candidates = [{**params, "model": model} for model in models] if models else [params]
+        keys = [ResultCache.make_key(**candidate) for candidate in candidates]
+        found = self.cache.get_first(keys)
+        if found is None:
+            return None
+        key, image_bytes, _ = found
+        params = candidates[keys.index(key)]
+        metrics.increment("generations", model=params["model"], size=f"{params['width']}x{params['height']}",
+                          outcome="cached")
+        return self.encoder.build_result(
+            Image.open(BytesIO(image_bytes)),
+            timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
+            seed=params["seed"],
+            width=params["width"],
+            height=params["height"],
+            generation=params,
+            cached=True
+        )
+    
+    def _finish_generation(self, params: Dict[str, Any], image: Image.Image) -> Dict[str, Any]:
+        """Decode a text-to-image response, build its result and store it under its parameters"""
+        width, height = params["width"], params["height"]
+        response = self.encoder.response_bytes(image)  # Decoding releases them
+        # Decode here, in the worker, once, before other threads may share the image
+        with metrics.timer("decode", model=params["model"], size=f"{width}x{height}"):
+            image.load()
+        
+        # Bytes are reused from the response or encoded on first access
+        result = self.encoder.build_result(
+            image,
+            response=response,
+            timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
+            seed=params["seed"],
+            width=width,
+            height=height,
+            generation=params
+        )
+        
+        if self.cache is not None:
+            # Store the response as received; it is re-encoded, if at all, when served again.
+            # Only images that didn't come from an encoded response are encoded here
+            image_bytes, fmt = response or (result["image_bytes"], self.encoder.target_format(image))
+            self.cache.put(ResultCache.make_key(**params), image_bytes, {
+                **params, "extension": FORMATS[fmt]["extension"], "mime_type": FORMATS[fmt]["mime_type"]
+            })
+        metrics.increment("generations", model=params["model"], size=f"{width}x{height}", outcome="success")
+        return result
+    
+    def add_watermark(self, image: Image.Image, text: str = "AI Generated") -> Image.Image:
+        """Add watermark to image"""
+        return self.watermarker.apply(image, text)
+    
+    def watermark_result(self, result: Dict[str, Any], text: str = None) -> Dict[str, Any]:
+        """Watermarked copy of one generation result; failed results are returned unchanged"""
+        return self.watermark_batch([result], text)[0]
+    
+    def watermark_batch(self, results: List[Dict[str, Any]], text: str = None) -> List[Dict[str, Any]]:
+        """
+        Watermark the images of several results (e.g. from generate_batch) in parallel
+        
+        Args:
+            results: Result dictionaries; failed ones are passed through
+            text: Watermark text (defaults to the watermarker's text)
+        
+        Returns:
+            New results in the same order, whose image_bytes are encoded from
+            the watermarked images on first access
+        """
+        ok = [result for result in results if result.get("success")]
+        with metrics.timer("watermark"):
+            watermarked = iter(self.watermarker.apply_many([result["image"] for result in ok], text))
+        output = []
+        for result in results:
+            if not result.get("success"):
+                output.append(result)
+                continue
+            fields = {
+                key: value for key, value in result.items()
+                if key not in ("success", "image", "image_bytes", "mime_type", "extension")
+            }
+            output.append(self.encoder.build_result(next(watermarked), watermarked=True, **fields))
+        return output
+
+class ImageGenerator(BaseImageGenerator):
     """Handles image generation using Stable Diffusion API"""
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        max_workers: int = 4,
+        cache: Optional[ResultCache] = None,
+        encoder: Optional[ImageEncoder] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        blender: Optional[TileBlender] = None,
+        watermarker: Optional[Watermarker] = None,
+        router: Optional[ModelRouter] = None,
+        draft_steps: int = 8,
+        draft_scale: float = 0.5
+    ):
+        super().__init__(max_workers, cache=cache, encoder=encoder, blender=blender, watermarker=watermarker,
+                         router=router, draft_steps=draft_steps, draft_scale=draft_scale)
         self.api_key = api_key
         self.client = InferenceClient(token=api_key)
-        self.model = "black-forest-labs/FLUX.1-schnell"
-        self.img2img_model = "stabilityai/stable-diffusion-2-1"  # For image-to-image
+        self.scheduler = scheduler  # Rate limiting and retries for API calls
+        self.single_flight = SingleFlight()  # Identical seeded requests share one call
+    
+    @classmethod
+    def from_config(cls, config, cache: Optional[ResultCache] = None) -> "ImageGenerator":
+        """Generator with the models, encoding, rate limit, retry, blending and draft settings of a Config"""
+        return cls(
+            config.api_key,
+            max_workers=config.batch_concurrency,
+            cache=cache,
+            encoder=ImageEncoder(
+                output_format=config.output_format,
+                quality=config.output_quality,
+                png_compress_level=config.png_compress_level
+            ),
+            scheduler=RequestScheduler(
+                TokenBucket(rate=config.rate_limit_per_minute / 60, capacity=config.rate_limit_burst),
+                max_retries=config.max_retries,
+                max_wait=config.retry_max_wait
+            ),
+            blender=TileBlender(tile_rows=config.blend_tile_rows, precision=config.blend_precision),
+            router=ModelRouter(config.models),
+            draft_steps=config.draft_steps,
+            draft_scale=config.draft_scale
+        )
+    
+    def _text_to_image(self, models: Optional[List[str]] = None, **kwargs) -> Tuple[Image.Image, str]:
+        """
+        Call the inference API on the model the router picks for the size,
+        through the scheduler when one is configured
+        
+        Args:
+            models: Models to try in order instead of routing
+            **kwargs: text_to_image arguments; any "model" is replaced
+        
+        Returns:
+            The image and the model that produced it
+        """
+        size = f"{kwargs['width']}x{kwargs['height']}"
+        
+        def infer(model):
+            with metrics.timer("inference", model=model, size=size):
+                return self.client.text_to_image(**{**kwargs, "model": model})
+        return self.router.call(infer, kwargs["width"], kwargs["height"], self.scheduler, models=models)
     
     def generate_image(
         self,
@@ -37,64 +339,186 @@ class ImageGenerator:
         Returns:
             Dictionary with success status, image data, or error message
         """
+        model = self.model  # Metrics label until the request is routed
         try:
             width, height = map(int, size.split("x"))
             
-            # Set seed if provided
+            # The seed always reaches the backend, so every result can be
+            # stored and served again; a random one is still unique, so there
+            # is nothing to look up or share
             if seed is None:
-                seed = random.randint(0, 2147483647)
-            
-            # Generate image using InferenceClient
-            image = self.client.text_to_image(
-                prompt=prompt,
-                model=self.model,
-                width=width,
-                height=height,
-                guidance_scale=guidance_scale,
-                negative_prompt=negative_prompt,
-                num_inference_steps=num_inference_steps
-            )
+                params = self.generation_params(prompt, width, height, guidance_scale, negative_prompt,
+                                                self.random_seed(), num_inference_steps)
+                models = self.router.route(width, height)
+                model = models[0]
+                return self._generate(params, models=models)
             
-            # Convert to bytes
-            img_byte_arr = BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            image_bytes = img_byte_arr.getvalue()
+            params = self.generation_params(prompt, width, height, guidance_scale, negative_prompt,
+                                            seed, num_inference_steps)
+            # Route first: the stored result, the shared call and the new
+            # result are all keyed by the model that serves the request
+            models = self.route_seeded(params)
+            model = models[0]
+            cached = self.load_generation(params, models)
+            if cached is not None:
+                return cached
             
-            return {
-                "success": True,
-                "image": image,
-                "image_bytes": image_bytes,
-                "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
-                "seed": seed,
-                "width": width,
-                "height": height
-            }
+            params = {**params, "model": model}
+            result, shared = self.single_flight.do(ResultCache.make_key(**params),
+                                                   lambda: self._generate(params, models=models))
+            # Waiters get their own dict around the same image
+            if shared:
+                metrics.increment("generations", model=result["generation"]["model"], size=size,
+                                  outcome="coalesced")
+                return result.copy()
+            return result
+        
+        except Exception as e:
+            metrics.increment("generations", model=model, size=size, outcome="error")
+            return generation_error(e)
+    
+    def replay(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Serve a past generation again from its recorded parameters
         
+        The stored image is returned when it is still cached; otherwise the
+        request is sent again with the same seed to the model that made it
+        (never a fallback), which reproduces it.
+        """
+        model = params.get("model")
+        if model not in self.router.names:
+            return {"success": False, "error": f"❌ Error: {model} is no longer in the model registry"}
+        try:
+            cached = self.load_generation(params)
+            if cached is not None:
+                return cached
+            result, shared = self.single_flight.do(ResultCache.make_key(**params),
+                                                   lambda: self._generate(params, models=[model]))
+            return result.copy() if shared else result
         except Exception as e:
-            error_msg = str(e)
-            if "Model is currently loading" in error_msg or "loading" in error_msg.lower():
-                return {"success": False, "error": "⏳ Model is loading. Please wait 30-60 seconds and try again."}
-            elif "rate limit" in error_msg.lower():
-                return {"success": False, "error": "⏱️ Rate limit reached. Please wait a few minutes and try again."}
-            elif "401" in error_msg or "Invalid" in error_msg or "Unauthorized" in error_msg:
-                return {
-                    "success": False, 
-                    "error": "🔑 Invalid API token. Please check SETUP_INSTRUCTIONS.md for help getting a valid token."
-                }
-            else:
-                return {"success": False, "error": f"❌ Error: {error_msg}"}
+            metrics.increment("generations", model=model, size=f"{params['width']}x{params['height']}",
+                              outcome="error")
+            return generation_error(e)
+    
+    def generate_draft(
+        self,
+        prompt: str,
+        size: str = "512x512",
+        guidance_scale: float = 7.5,
+        negative_prompt: str = None,
+        seed: int = None
+    ) -> Dict[str, Any]:
+        """
+        Quick preview of generate_image: the same prompt and settings at
+        draft_scale of the size and draft_steps steps
+        
+        Pass the result's "generation" to refine once the draft is
+        accepted; the final render reuses its seed and model.
+        
+        Returns:
+            Dictionary with success status, image data, or error message
+        """
+        try:
+            draft_size, draft_steps = self.draft_params(size)
+        except ValueError as e:
+            return generation_error(e)
+        result = self.generate_image(
+            prompt=prompt,
+            size=draft_size,
+            guidance_scale=guidance_scale,
+            negative_prompt=negative_prompt,
+            seed=seed,  # Without one, drawn on the unseeded path; the result reports it
+            num_inference_steps=draft_steps
+        )
+        if result["success"]:
+            metrics.increment("drafts", model=result["generation"]["model"], outcome="drafted")
+        return result
+    
+    def refine(self, draft: Dict[str, Any], size: str = "512x512", num_inference_steps: int = 50) -> Dict[str, Any]:
+        """
+        Render the final image of an accepted draft
+        
+        Args:
+            draft: The draft result's "generation" parameters
+            size: Final image dimensions
+            num_inference_steps: Final number of denoising steps
+        
+        Returns:
+            Dictionary with success status, image data, or error message
+        """
+        try:
+            params = self.refine_params(draft, size, num_inference_steps)
+        except ValueError as e:
+            return generation_error(e)
+        result = self.replay(params)
+        if result["success"]:
+            metrics.increment("drafts", model=params["model"], outcome="refined")
+        return result
+    
+    def _generate(self, params: Dict[str, Any], models: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Make the remote call for generate_image and store the result under its parameters"""
+        # Generate image using InferenceClient, recording the model that actually served it
+        image, model = self._text_to_image(models=models, **params)
+        return self._finish_generation({**params, "model": model}, image)
+    
+    def iter_batch(
+        self,
+        prompt: str,
+        count: int = 4,
+        max_workers: int = None,
+        **kwargs
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Generate multiple images concurrently, yielding each as it finishes
+        
+        Args:
+            prompt: Text description of desired image
+            count: Number of variations to generate
+            max_workers: Concurrency limit (defaults to self.max_workers)
+            **kwargs: Passed through to generate_image
+        
+        Yields:
+            (index, result) pairs in completion order, where index is the
+            position of the variation in the batch. Every result carries
+            a "duration" in seconds; successful ones carry their random "seed".
+        """
+        workers = max(1, min(max_workers or self.max_workers, count))
+        
+        def run():
+            # Unseeded, so the fresh random seed skips the cache lookup
+            start = time.perf_counter()
+            result = self.generate_image(prompt=prompt, **kwargs)
+            result["duration"] = time.perf_counter() - start
+            return result
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run): idx for idx in range(count)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
     
     def generate_batch(
         self,
         prompt: str,
         count: int = 4,
+        max_workers: int = None,
         **kwargs
     ) -> List[Dict[str, Any]]:
-        """Generate multiple images with different seeds"""
-        results = []
-        for i in range(count):
-            result = self.generate_image(prompt=prompt, seed=None, **kwargs)
-            results.append(result)
+        """
+        Generate multiple images with different seeds concurrently
+        
+        Args:
+            prompt: Text description of desired image
+            count: Number of variations to generate
+            max_workers: Concurrency limit (defaults to self.max_workers)
+            **kwargs: Passed through to generate_image
+        
+        Returns:
+            One result dictionary per seed, in seed order. Failed requests
+            keep their slot with an error, so partial batches are returned.
+        """
+        results = [None] * count
+        for idx, result in self.iter_batch(prompt, count=count, max_workers=max_workers, **kwargs):
+            results[idx] = result
         return results
     
     def image_to_image(
@@ -103,7 +527,9 @@ class ImageGenerator:
         init_image: Image.Image,
         strength: float = 0.75,
         guidance_scale: float = 7.5,
-        negative_prompt: str = None
+        negative_prompt: str = None,
+        blend_mode: str = "normal",
+        mask: Optional[Image.Image] = None
     ) -> Dict[str, Any]:
         """
         Generate image from an initial image and prompt using style transfer
@@ -114,6 +540,10 @@ class ImageGenerator:
             strength: How much to transform (0.0-1.0, higher = more change)
             guidance_scale: How closely to follow the prompt
             negative_prompt: What to avoid
+            blend_mode: How the generated image is combined with the original
+                (see blending.BLEND_MODES)
+            mask: Optional greyscale strength mask; white regions get the full
+                strength, black regions keep the original
         
         Returns:
             Dictionary with success status, image data, or error message
@@ -123,25 +553,11 @@ class ImageGenerator:
             # with the prompt and blending it with the original
             # This is a workaround since FLUX doesn't support img2img
             
-            # Get dimensions from original image
-            width, height = init_image.size
-            
-            # Ensure dimensions are within limits
-            max_size = 768
-            if max(width, height) > max_size:
-                ratio = max_size / max(width, height)
-                width = int(width * ratio)
-                height = int(height * ratio)
-                init_image = init_image.resize((width, height), Image.Resampling.LANCZOS)
-            
-            # Round to nearest multiple of 8 (required by model)
-            width = (width // 8) * 8
-            height = (height // 8) * 8
+            width, height = style_request_size(*init_image.size)
             
             # Generate new image with the style prompt
-            result_image = self.client.text_to_image(
+            result_image, _ = self._text_to_image(
                 prompt=prompt,
-                model=self.model,
                 width=width,
                 height=height,
                 guidance_scale=guidance_scale,
@@ -149,59 +565,16 @@ class ImageGenerator:
             )
             
             # Blend with original based on strength
-            if strength < 1.0:
-                # Resize result to match original if needed
-                if result_image.size != init_image.size:
-                    result_image = result_image.resize(init_image.size, Image.Resampling.LANCZOS)
-                
-                # Blend images
-                from PIL import ImageChops
-                result_image = Image.blend(init_image, result_image, strength)
-            
-            # Convert result to bytes
-            result_byte_arr = BytesIO()
-            result_image.save(result_byte_arr, format='PNG')
-            result_bytes = result_byte_arr.getvalue()
+            if strength < 1.0 or blend_mode != "normal" or mask is not None:
+                with metrics.timer("blend", mode=blend_mode, size=f"{init_image.width}x{init_image.height}"):
+                    result_image = self.blender.blend(init_image, result_image, strength, blend_mode, mask)
             
-            return {
-                "success": True,
-                "image": result_image,
-                "image_bytes": result_bytes,
-                "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
-                "width": result_image.width,
-                "height": result_image.height
-            }
+            return self.encoder.build_result(
+                result_image,
+                timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
+                width=result_image.width,
+                height=result_image.height
+            )
         
         except Exception as e:
-            error_msg = str(e)
-            if "loading" in error_msg.lower():
-                return {"success": False, "error": "⏳ Model is loading. Please wait and try again."}
-            elif "rate limit" in error_msg.lower():
-                return {"success": False, "error": "⏱️ Rate limit reached. Please wait a moment."}
-            else:
-                return {"success": False, "error": f"❌ Error: {error_msg}"}
-    
-    def add_watermark(self, image: Image.Image, text: str = "AI Generated") -> Image.Image:
-        """Add watermark to image"""
-        watermarked = image.copy()
-        draw = ImageDraw.Draw(watermarked)
-        
-        # Position watermark at bottom right
-        width, height = watermarked.size
-        text_bbox = draw.textbbox((0, 0), text)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        position = (width - text_width - 10, height - text_height - 10)
-        
-        # Draw semi-transparent background
-        draw.rectangle(
-            [position[0] - 5, position[1] - 5, 
-             position[0] + text_width + 5, position[1] + text_height + 5],
-            fill=(0, 0, 0, 128)
-        )
-        
-        # Draw text
-        draw.text(position, text, fill=(255, 255, 255, 200))
-        
-        return watermarked
+            return style_transfer_error(e)
@@ -0,0 +1,151 @@
+"""Background generation jobs, decoupled from Streamlit reruns"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional
+
+from src.metrics import metrics
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+class Job:
+    """A unit of work submitted to the queue and its outcome"""
+
+    def __init__(self, owner: str, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"  # queued -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Seconds spent running, once finished"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+class JobQueue:
+    """
+    Fixed worker pool that drains per-owner queues round-robin
+
+    Each owner (a browser session) has its own FIFO; workers take one job
+    from each owner in turn, so a large batch from one user cannot starve
+    everyone else. Submitting beyond `max_pending` waiting jobs raises
+    QueueFull, which is the backpressure signal shown to the user.
+    Finished jobs are kept for `result_ttl` seconds for polling; expired
+    ones are dropped on submit and get, after each job and by idle workers,
+    so their images are released even if nobody submits or polls again.
+    """
+
+    def __init__(self, num_workers: int = 4, max_pending: int = 100, result_ttl: float = 600):
+        self.num_workers = num_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._owners = OrderedDict()  # owner -> deque of queued jobs, in rotation order
+        self._jobs: Dict[str, Job] = {}
+        self._pending = 0
+        self._running = 0
+        self._cond = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, owner: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """Queue fn(*args, **kwargs) on behalf of owner and return the job id"""
+        with self._cond:
+            self._purge()
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} jobs are already waiting")
+            job = Job(owner, fn, args, kwargs)
+            self._jobs[job.id] = job
+            self._owners.setdefault(owner, deque()).append(job)
+            self._pending += 1
+            self._cond.notify()
+            return job.id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job; None if unknown or expired"""
+        with self._cond:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> int:
+        """Number of jobs that will start before this one (0 once running)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return 0
+            own_index = self._owners[job.owner].index(job)
+            # Round-robin: every other owner gets up to own_index + 1 turns first
+            return own_index + sum(
+                min(len(jobs), own_index + 1)
+                for owner, jobs in self._owners.items() if owner != job.owner
+            )
+
+    def stats(self) -> Dict:
+        """Get queue depth and worker utilisation"""
+        with self._cond:
+            return {
+                "pending": self._pending,
+                "running": self._running,
+                "workers": self.num_workers,
+                "owners_waiting": len(self._owners)
+            }
+
+    def _next_job(self) -> Job:
+        with self._cond:
+            while not self._owners:
+                self._cond.wait(timeout=self.result_ttl)
+                self._purge()
+            owner, jobs = next(iter(self._owners.items()))
+            job = jobs.popleft()
+            del self._owners[owner]
+            if jobs:
+                self._owners[owner] = jobs  # Back of the rotation
+            self._pending -= 1
+            self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+        metrics.observe("queue_wait", job.started_at - job.submitted_at)
+        return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            try:
+                job.result = job.fn(*job.args, **job.kwargs)
+                status = "done"
+            except Exception as e:
+                job.error = str(e)
+                status = "failed"
+            with self._cond:
+                job.finished_at = time.time()
+                job.status = status
+                job.fn = job.args = job.kwargs = None  # Drop references to inputs
+                self._running -= 1
+                self._purge()
+
+    def _purge(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,194 @@
+"""Per-stage timers, counters and histograms with Prometheus text export"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.running_stats import QuantileSketch
+
+# Upper bounds (seconds) of the exported histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = "imagegen"
+
+class _Histogram:
+    """Bucket counts for export plus a quantile sketch for p50/p95/p99"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.sketch = QuantileSketch()
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        self.sketch.add(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+class MetricsRegistry:
+    """
+    Thread-safe store of stage durations and event counters
+
+    Every series is identified by a name plus labels (typically model and
+    size), so the same stage can be broken down per model and per image
+    size. Recording is a dictionary lookup and a few additions under a
+    lock; percentiles are only computed when read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple, _Histogram] = {}
+        self._counters: Dict[Tuple, float] = {}
+
+    @contextmanager
+    def timer(self, stage: str, **labels) -> Iterator[None]:
+        """Time the enclosed block as one observation of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def observe(self, stage: str, seconds: float, **labels):
+        """Record a duration for stage"""
+        key = (stage, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def stage_summary(self) -> List[Dict]:
+        """One row per stage and label set, with count and p50/p95/p99 in seconds"""
+        with self._lock:
+            rows = []
+            for (stage, labels), histogram in sorted(self._histograms.items()):
+                rows.append({
+                    "stage": stage,
+                    **dict(labels),
+                    "count": histogram.count,
+                    "total": histogram.sum,
+                    "p50": histogram.sketch.quantile(0.50),
+                    "p95": histogram.sketch.quantile(0.95),
+                    "p99": histogram.sketch.quantile(0.99)
+                })
+            return rows
+
+    def counters(self) -> List[Dict]:
+        """One row per counter and label set"""
+        with self._lock:
+            return [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+
+    def to_prometheus(self) -> str:
+        """Render every series in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            if self._histograms:
+                name = f"{PREFIX}_stage_duration_seconds"
+                lines += [f"# HELP {name} Time spent in each pipeline stage",
+                          f"# TYPE {name} histogram"]
+                for (stage, labels), histogram in sorted(self._histograms.items()):
+                    base = (("stage", stage),) + labels
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(base + (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(base + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(base)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(base)} {histogram.count}")
+
+            names = sorted({name for name, _ in self._counters})
+            for counter in names:
+                metric = f"{PREFIX}_{counter}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (name, labels), value in sorted(self._counters.items()):
+                    if name == counter:
+                        lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Forget every series"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+metrics = MetricsRegistry()
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+def start_exporters(port: Optional[int] = None, path: Optional[str] = None, interval: float = 15.0):
+    """
+    Expose the global registry to Prometheus
+
+    Only the first call takes effect, like configure_http_pool.
+
+    Args:
+        port: Serve /metrics over HTTP on this port
+        path: Rewrite this file every `interval` seconds (for the node
+            exporter's textfile collector)
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    if port:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the log
+
+        server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+    if path:
+        def write_forever():
+            while True:
+                try:
+                    write_metrics_file(path)
+                except OSError as e:
+                    print(f"Error writing metrics file: {e}")
+                time.sleep(interval)
+
+        threading.Thread(target=write_forever, name="metrics-file", daemon=True).start()
+
+def write_metrics_file(path: str):
+    """Atomically write the global registry in Prometheus text format"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(metrics.to_prometheus())
+    os.replace(tmp_path, path)
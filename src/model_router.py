@@ -0,0 +1,302 @@
+"""Model registry and per-request routing by observed latency, errors and size"""
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.metrics import metrics
+from src.running_stats import QuantileSketch
+from src.scheduler import RequestScheduler, classify_error
+
+DEFAULT_MODELS = "black-forest-labs/FLUX.1-schnell:2048,stabilityai/stable-diffusion-xl-base-1.0:1024"
+
+class ModelSpec:
+    """
+    One text-to-image backend in the registry
+
+    Args:
+        name: Model id (or endpoint URL) passed to the inference client
+        max_side: Largest width or height the model should be asked for
+    """
+
+    def __init__(self, name: str, max_side: int = 1024):
+        self.name = name
+        self.max_side = max_side
+
+    def supports(self, width: int, height: int) -> bool:
+        return max(width, height) <= self.max_side
+
+    def __repr__(self) -> str:
+        return f"ModelSpec({self.name!r}, max_side={self.max_side})"
+
+def parse_models(value: str) -> List[ModelSpec]:
+    """
+    Parse a registry string: comma-separated "model" or "model:max_side"
+    entries, preferred first. Models may be endpoint URLs; the port of a
+    URL without a path is not taken for a size.
+    """
+    specs = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, max_side = item.rpartition(":")
+        if name and max_side.isdigit() and not ("://" in name and "/" not in name.split("://", 1)[1]):
+            specs.append(ModelSpec(name, int(max_side)))
+        else:
+            specs.append(ModelSpec(item))
+    if not specs:
+        raise ValueError("❌ IMAGE_MODELS lists no models")
+    return specs
+
+class _Health:
+    """Observed behaviour of one model"""
+
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.errors = 0
+        self.fallbacks = 0  # Requests handed on to another model
+        self.seconds_per_mp = None  # Moving average of latency per megapixel
+        self.error_rate = 0.0  # Moving average of failed calls
+        self.unavailable_until = 0.0  # Loading or rate-limited until then
+        self.latency = QuantileSketch()
+
+class ModelStats:
+    """
+    Thread-safe health of every model, shared by all routers in the process
+
+    Latency is tracked per megapixel, so requests of different sizes
+    inform one estimate; error rate and latency are exponential moving
+    averages, so a model that recovers wins its traffic back.
+    """
+
+    def __init__(self, decay: float = 0.2):
+        self.decay = decay
+        self._lock = threading.Lock()
+        self._models: Dict[str, _Health] = {}
+
+    def _health(self, model: str) -> _Health:
+        health = self._models.get(model)
+        if health is None:
+            health = self._models[model] = _Health()
+        return health
+
+    def record_success(self, model: str, seconds: float, megapixels: float):
+        with self._lock:
+            health = self._health(model)
+            health.requests += 1
+            health.successes += 1
+            health.latency.add(seconds)
+            rate = seconds / max(megapixels, 0.01)
+            if health.seconds_per_mp is None:
+                health.seconds_per_mp = rate
+            else:
+                health.seconds_per_mp += self.decay * (rate - health.seconds_per_mp)
+            health.error_rate -= self.decay * health.error_rate
+
+    def record_failure(self, model: str, cooldown: Optional[float] = None, fallback: bool = False):
+        """Count a failed call; cooldown keeps the model out of first place for that many seconds"""
+        with self._lock:
+            health = self._health(model)
+            health.requests += 1
+            health.errors += 1
+            health.error_rate += self.decay * (1 - health.error_rate)
+            if cooldown:
+                health.unavailable_until = max(health.unavailable_until, time.monotonic() + cooldown)
+            if fallback:
+                health.fallbacks += 1
+
+    def estimate(self, model: str, megapixels: float) -> Tuple[Optional[float], float, float]:
+        """(expected seconds or None if never measured, error rate, seconds until available)"""
+        with self._lock:
+            health = self._health(model)
+            expected = None if health.seconds_per_mp is None else health.seconds_per_mp * megapixels
+            return expected, health.error_rate, max(health.unavailable_until - time.monotonic(), 0.0)
+
+    def snapshot(self) -> List[Dict]:
+        """One row per model seen so far"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "model": model,
+                    "requests": health.requests,
+                    "successes": health.successes,
+                    "errors": health.errors,
+                    "fallbacks": health.fallbacks,
+                    "error_rate": health.error_rate,
+                    "seconds_per_mp": health.seconds_per_mp,
+                    "p50": health.latency.quantile(0.50),
+                    "p95": health.latency.quantile(0.95),
+                    "unavailable_for": max(health.unavailable_until - now, 0.0)
+                }
+                for model, health in sorted(self._models.items())
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+model_stats = ModelStats()
+
+class ModelRouter:
+    """
+    Pick the model for each request and fall back when it is unavailable
+
+    Models that can't produce the requested size are skipped. The rest are
+    ranked by expected time to a successful result (latency scaled to the
+    request size, divided by the success rate), with a `preference`
+    handicap per position in the registry, so a secondary model only takes
+    over when it is clearly faster. A model without a latency measurement
+    yet is tried first, and an `explore` fraction of requests goes to the
+    runner-up, so estimates stay current and a recovered model wins its
+    traffic back. Requests that must be reproducible (a user-chosen seed)
+    are never used for these probes. Models that are loading or rate-limited go to the back
+    of the line for `cooldown` seconds (or the server's Retry-After hint).
+
+    A request that hits a loading (503) or rate-limited (429) model moves
+    straight on to the next one; only the last candidate is retried with
+    the scheduler's backoff. Other errors are not retried on another model.
+
+    Args:
+        models: Registry, preferred model first
+        stats: Shared health table (the process-wide model_stats by default)
+        preference: Extra expected cost per position in the registry
+        cooldown: Seconds to avoid a model after a 503/429 without a hint
+        explore: Fraction of requests sent to the second-ranked model
+    """
+
+    def __init__(
+        self,
+        models: List[ModelSpec],
+        stats: Optional[ModelStats] = None,
+        preference: float = 0.25,
+        cooldown: float = 30.0,
+        explore: float = 0.05
+    ):
+        if not models:
+            raise ValueError("Model registry is empty")
+        self.models = models
+        self.stats = stats or model_stats
+        self.preference = preference
+        self.cooldown = cooldown
+        self.explore = explore
+        self._random = random.Random()
+
+    @property
+    def primary(self) -> str:
+        return self.models[0].name
+
+    @property
+    def names(self) -> List[str]:
+        return [spec.name for spec in self.models]
+
+    def route(self, width: int, height: int, probe: bool = True) -> List[str]:
+        """
+        Models to try for a request of this size, best first
+
+        With probe=False the request is not used to measure unmeasured
+        models or to explore: those are assumed as fast as the best
+        measured model, so the same request keeps going to the same model.
+        """
+        fitting = [spec for spec in self.models if spec.supports(width, height)] or self.models
+        megapixels = width * height / 1_000_000
+        estimates = {spec.name: self.stats.estimate(spec.name, megapixels) for spec in fitting}
+        known = [expected for expected, _, _ in estimates.values() if expected is not None]
+        baseline = min(known) if known else 1.0
+
+        def rank(item):
+            position, spec = item
+            expected, error_rate, unavailable = estimates[spec.name]
+            if expected is None:
+                if probe:
+                    return unavailable > 0, 0.0, position  # Measure it first
+                expected = baseline
+            cost = expected / max(1 - error_rate, 0.05)
+            return unavailable > 0, cost * (1 + self.preference * position), position
+
+        ranked = [spec.name for _, spec in sorted(enumerate(fitting), key=rank)]
+        if probe and len(ranked) > 1 and not estimates[ranked[1]][2] and self._random.random() < self.explore:
+            ranked[0], ranked[1] = ranked[1], ranked[0]
+        return ranked
+
+    def call(
+        self,
+        fn: Callable[[str], Any],
+        width: int,
+        height: int,
+        scheduler: Optional[RequestScheduler] = None,
+        models: Optional[List[str]] = None
+    ) -> Tuple[Any, str]:
+        """
+        Call fn(model) on the best model, falling back on 503/429
+
+        Args:
+            fn: Makes the request to the model it is given
+            width, height: Requested size, for routing and latency per megapixel
+            scheduler: Rate limiting and retries for each call
+            models: Models to try in order instead of routing (e.g. to
+                reproduce a past generation on the model that made it)
+
+        Returns:
+            (result, model): fn's result and the model that produced it
+        """
+        candidates = models or self.route(width, height)
+        for position, model in enumerate(candidates):
+            last = position == len(candidates) - 1
+            start = time.perf_counter()
+            try:
+                if scheduler is None:
+                    result = fn(model)
+                elif last:
+                    result = scheduler.call(fn, model)
+                else:
+                    result = scheduler.call_once(fn, model)
+            except Exception as e:
+                if not self._on_failure(e, model, candidates, position):
+                    raise
+                continue
+            self.stats.record_success(model, time.perf_counter() - start, width * height / 1_000_000)
+            return result, model
+
+    async def acall(
+        self,
+        fn: Callable[[str], Awaitable[Any]],
+        width: int,
+        height: int,
+        scheduler: Optional[RequestScheduler] = None,
+        models: Optional[List[str]] = None
+    ) -> Tuple[Any, str]:
+        """Like call, for a coroutine function"""
+        candidates = models or self.route(width, height)
+        for position, model in enumerate(candidates):
+            last = position == len(candidates) - 1
+            start = time.perf_counter()
+            try:
+                if scheduler is None:
+                    result = await fn(model)
+                elif last:
+                    result = await scheduler.acall(fn, model)
+                else:
+                    result = await scheduler.acall_once(fn, model)
+            except Exception as e:
+                if not self._on_failure(e, model, candidates, position):
+                    raise
+                continue
+            self.stats.record_success(model, time.perf_counter() - start, width * height / 1_000_000)
+            return result, model
+
+    def _on_failure(self, error: Exception, model: str, candidates: List[str], position: int) -> bool:
+        """Record a failed call; True when the request should move on to the next model"""
+        status, hint = classify_error(error)
+        fallback = status is not None and position < len(candidates) - 1
+        self.stats.record_failure(
+            model,
+            cooldown=(hint if hint is not None else self.cooldown) if status is not None else None,
+            fallback=fallback
+        )
+        if fallback:
+            metrics.increment("model_fallbacks", model=model, to=candidates[position + 1],
+                              reason="rate_limited" if status == 429 else "loading")
+        return fallback
@@ -0,0 +1,144 @@
+"""Disk-backed cache of generated images"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+class ResultCache:
+    """Content-addressed image cache with LRU eviction under a byte budget"""
+
+    def __init__(self, cache_dir: str = ".image_cache", max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> bytes on disk, least recently used first
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(**params) -> str:
+        """Hash generation parameters into a stable cache key"""
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.png", f"{base}.json"
+
+    def _load_index(self):
+        """Rebuild LRU order from the files on disk (mtime = last access)"""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".png"):
+                continue
+            key = name[:-4]
+            image_path, meta_path = self._paths(key)
+            try:
+                stat = os.stat(image_path)
+                size = stat.st_size + os.path.getsize(meta_path)
+            except OSError:
+                self._remove_files(key)
+                continue
+            found.append((stat.st_mtime, key, size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        """Return (image_bytes, metadata) for a key, or None on a miss"""
+        found = self.get_first([key])
+        return None if found is None else found[1:]
+
+    def get_first(self, keys: List[str]) -> Optional[Tuple[str, bytes, Dict]]:
+        """Return (key, image_bytes, metadata) for the first stored key, counting one hit or miss"""
+        with self._lock:
+            for key in keys:
+                if key not in self._entries:
+                    continue
+
+                image_path, meta_path = self._paths(key)
+                try:
+                    with open(image_path, 'rb') as f:
+                        image_bytes = f.read()
+                    with open(meta_path, 'r') as f:
+                        metadata = json.load(f)
+                    os.utime(image_path, None)  # Persist recency across restarts
+                except (OSError, ValueError):
+                    self._discard(key)
+                    continue
+
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, image_bytes, metadata
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, image_bytes: bytes, metadata: Dict):
+        """Store image bytes and metadata under a key"""
+        meta_bytes = json.dumps(metadata).encode("utf-8")
+        size = len(image_bytes) + len(meta_bytes)
+        if size > self.max_bytes:
+            return
+
+        image_path, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                self._write_atomic(meta_path, meta_bytes)
+                self._write_atomic(image_path, image_bytes)
+            except OSError as e:
+                print(f"Error writing cache entry: {e}")
+                return
+
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters and cache size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups * 100) if lookups > 0 else 0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes
+            }
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._discard(key)
+
+    def _discard(self, key: str):
+        self._total_bytes -= self._entries.pop(key, 0)
+        self._remove_files(key)
+
+    def _remove_files(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,137 @@
+"""Incrementally maintained generation statistics"""
+import math
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+class QuantileSketch:
+    """Streaming quantile estimator with bounded relative error
+
+    Values are counted in logarithmically sized buckets, so memory grows
+    with the dynamic range of the data rather than the number of samples,
+    and any quantile is within `relative_accuracy` of the true value.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.zero_count = 0  # Values too small to take a log of
+        self.count = 0
+
+    def add(self, value: float):
+        """Record one non-negative sample"""
+        self.count += 1
+        if value <= 1e-9:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self._log_gamma)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-th quantile (0.0-1.0), or None if empty"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i]
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def state(self) -> Dict:
+        """JSON-serializable contents, for restore"""
+        return {
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "zero_count": self.zero_count,
+            "count": self.count
+        }
+
+    def restore(self, state: Dict):
+        """Replace the contents with a previously saved state"""
+        self.buckets = Counter({int(index): count for index, count in state["buckets"].items()})
+        self.zero_count = state["zero_count"]
+        self.count = state["count"]
+
+class RunningStats:
+    """Counters updated per generation so reads never rescan history"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self.total = 0
+            self.successful = 0
+            self.by_size = Counter()
+            self.by_style = Counter()
+            self.failure_reasons = Counter()
+            self.latency = QuantileSketch()
+
+    def record(self, entry: Dict):
+        """Fold one history entry into the counters"""
+        settings = entry.get("settings", {})
+        with self._lock:
+            self.total += 1
+            if entry.get("success", False):
+                self.successful += 1
+            else:
+                self.failure_reasons[failure_reason(entry.get("error"))] += 1
+            if settings.get("size"):
+                self.by_size[settings["size"]] += 1
+            self.by_style[settings.get("style") or "None"] += 1
+            if entry.get("duration") is not None:
+                self.latency.add(entry["duration"])
+
+    def state(self) -> Dict:
+        """JSON-serializable counters, so another process can start from them"""
+        with self._lock:
+            return {
+                "total": self.total,
+                "successful": self.successful,
+                "by_size": dict(self.by_size),
+                "by_style": dict(self.by_style),
+                "failure_reasons": dict(self.failure_reasons),
+                "latency": self.latency.state()
+            }
+
+    def restore(self, state: Dict):
+        """Replace the counters with a previously saved state"""
+        with self._lock:
+            self.total = state["total"]
+            self.successful = state["successful"]
+            self.by_size = Counter(state["by_size"])
+            self.by_style = Counter(state["by_style"])
+            self.failure_reasons = Counter(state["failure_reasons"])
+            self.latency = QuantileSketch()
+            self.latency.restore(state["latency"])
+
+    def snapshot(self) -> Dict:
+        """Get a consistent copy of all counters"""
+        with self._lock:
+            return {
+                "total_generations": self.total,
+                "successful": self.successful,
+                "failed": self.total - self.successful,
+                "success_rate": (self.successful / self.total * 100) if self.total > 0 else 0,
+                "by_size": dict(self.by_size),
+                "by_style": dict(self.by_style),
+                "failure_reasons": dict(self.failure_reasons),
+                "latency": {
+                    "count": self.latency.count,
+                    "p50": self.latency.quantile(0.50),
+                    "p95": self.latency.quantile(0.95),
+                    "p99": self.latency.quantile(0.99)
+                }
+            }
+
+def failure_reason(error: Optional[str]) -> str:
+    """Reduce an error message to a short, low-cardinality reason"""
+    if not error:
+        return "Unknown"
+    return error.splitlines()[0].split(". ")[0][:80]
@@ -0,0 +1,214 @@
+"""Retry, backoff and rate limiting around inference calls"""
+import asyncio
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+class SchedulerTimeout(Exception):
+    """Raised when a request could not be scheduled within its wait budget"""
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every caller in the process
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst size
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take one token, waiting for it if needed; False if timeout expires"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """Like acquire, but waits on the event loop instead of blocking a thread"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.01)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while, e.g. after a 429"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class RequestScheduler:
+    """
+    Run inference calls through a shared token bucket with jittered retries
+
+    Model-loading (503) and rate-limit (429) errors are retried with full
+    jitter exponential backoff, or after the server's Retry-After /
+    estimated_time hint when it sends one. A 429 also pauses the shared
+    bucket so other sessions back off too. Requests wait in line instead of
+    failing until `max_wait` seconds have passed.
+    """
+
+    def __init__(
+        self,
+        bucket: Optional[TokenBucket] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        max_wait: float = 120.0
+    ):
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.retries = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call fn, queueing and retrying it according to the schedule"""
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self.max_wait - (time.monotonic() - start)
+            if self.bucket is not None and not self.bucket.acquire(timeout=max(remaining, 0)):
+                self._count("gave_up")
+                raise SchedulerTimeout("Rate limit queue wait exceeded")
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, start)
+                attempt += 1
+                time.sleep(delay)
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await fn (a coroutine function) with the same queueing and retries as call"""
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self.max_wait - (time.monotonic() - start)
+            if self.bucket is not None and not await self.bucket.acquire_async(timeout=max(remaining, 0)):
+                self._count("gave_up")
+                raise SchedulerTimeout("Rate limit queue wait exceeded")
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, start)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def call_once(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn once through the rate limiter, without retries
+
+        For callers with somewhere else to go (e.g. another model) when the
+        endpoint is loading or rate-limited. A 429 here does not pause the
+        shared bucket: it concerns that endpoint only, and the caller tracks
+        it (see ModelRouter's cooldown) while requests go elsewhere.
+        """
+        if self.bucket is not None and not self.bucket.acquire(timeout=self.max_wait):
+            self._count("gave_up")
+            raise SchedulerTimeout("Rate limit queue wait exceeded")
+        return fn(*args, **kwargs)
+
+    async def acall_once(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await fn once through the rate limiter, without retries (see call_once)"""
+        if self.bucket is not None and not await self.bucket.acquire_async(timeout=self.max_wait):
+            self._count("gave_up")
+            raise SchedulerTimeout("Rate limit queue wait exceeded")
+        return await fn(*args, **kwargs)
+
+    def _retry_delay(self, error: Exception, attempt: int, start: float) -> float:
+        """Seconds to wait before retrying after error; re-raises it when it should not be retried"""
+        status, hint = classify_error(error)
+        if status is None or attempt >= self.max_retries:
+            raise error
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = hint + random.uniform(0, self.base_delay) if hint is not None else random.uniform(0, backoff)
+        if time.monotonic() - start + delay > self.max_wait:
+            self._count("gave_up")
+            raise error
+        if status == 429 and self.bucket is not None:
+            self.bucket.pause(delay)
+        self._count("retries")
+        return delay
+
+    def stats(self) -> Dict:
+        """Get retry counters"""
+        with self._lock:
+            return {"retries": self.retries, "gave_up": self.gave_up}
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+def classify_error(error: Exception) -> Tuple[Optional[int], Optional[float]]:
+    """
+    Decide whether an error is worth retrying
+
+    Returns:
+        (status, delay_hint): status is 429 or 503 for retryable errors and
+        None otherwise; delay_hint is the server-suggested wait in seconds
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    message = str(error).lower()
+    if status not in (429, 503):
+        if "rate limit" in message:
+            status = 429
+        elif "loading" in message:
+            status = 503
+        else:
+            return None, None
+
+    hint = None
+    if response is not None:
+        hint = _parse_retry_after(response.headers.get("retry-after"))
+        if hint is None:
+            try:
+                estimated = json.loads(response.content).get("estimated_time")
+                hint = float(estimated) if estimated is not None else None
+            except Exception:
+                pass  # Body missing, not JSON, or not readable
+    return status, hint
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,204 @@
+"""Per-session gallery of generated images"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from io import BytesIO
+from typing import List, Dict, Optional
+
+from PIL import Image
+
+from src.image_encoding import FORMATS
+
+THUMBNAIL_FORMATS = {"JPEG": "jpg", "WEBP": "webp"}
+
+def make_thumbnail(image: Image.Image, size: int = 256, fmt: str = "WEBP", quality: int = 80) -> bytes:
+    """Downscale an image into a compressed preview"""
+    scale = min(size / image.width, size / image.height, 1.0)
+    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # reducing_gap lets PIL shrink by integer factors first, without copying the full image
+    preview = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if preview.mode not in ("RGB", "RGBA") or fmt == "JPEG":
+        preview = preview.convert("RGB")
+    buf = BytesIO()
+    preview.save(buf, format=fmt, quality=quality)
+    return buf.getvalue()
+
+class SessionGallery:
+    """
+    Gallery that keeps full images on disk and only thumbnails in memory
+
+    Full-resolution images and their compressed thumbnails are written to a
+    per-session directory as they are added. A window of thumbnails is kept
+    in RAM up to `max_memory_bytes`; older ones are dropped and read back
+    from their thumbnail file if they are needed again.
+    """
+
+    def __init__(
+        self,
+        storage_dir: str,
+        max_memory_bytes: int = 8 * 1024 * 1024,
+        thumbnail_size: int = 256,
+        thumbnail_format: str = "WEBP",
+        thumbnail_quality: int = 80
+    ):
+        if thumbnail_format not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Unsupported thumbnail format: {thumbnail_format}")
+        self.storage_dir = storage_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_format = thumbnail_format
+        self.thumbnail_quality = thumbnail_quality
+        self.items: List[Dict] = []  # Metadata only, newest last
+        self._index: Dict[str, Dict] = {}  # item id -> metadata
+        self._thumbnails = OrderedDict()  # item id -> JPEG bytes, least recently used first
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(storage_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes of thumbnail data currently held in memory"""
+        return self._memory_bytes
+
+    def add(
+        self,
+        image_bytes: bytes,
+        prompt: str,
+        settings: Dict,
+        image: Optional[Image.Image] = None,
+        extension: str = "png"
+    ) -> str:
+        """
+        Store a generated image and return its gallery id
+
+        Args:
+            image_bytes: Encoded full-resolution image
+            prompt: Prompt used for the generation
+            settings: Generation settings shown in the gallery
+            image: Already decoded image, saves decoding image_bytes again
+            extension: File extension matching the encoding of image_bytes
+        """
+        item_id = uuid.uuid4().hex
+        path = os.path.join(self.storage_dir, f"{item_id}.{extension}")
+        with open(path, 'wb') as f:
+            f.write(image_bytes)
+
+        if image is None:
+            image = Image.open(BytesIO(image_bytes))
+        thumbnail = self._make_thumbnail(image)
+        with open(self._thumbnail_path(item_id), 'wb') as f:
+            f.write(thumbnail)
+
+        item = {
+            "id": item_id,
+            "path": path,
+            "prompt": prompt,
+            "settings": settings,
+            "extension": extension,
+            "mime_type": next(
+                (f["mime_type"] for f in FORMATS.values() if f["extension"] == extension),
+                "application/octet-stream"
+            ),
+            "width": image.width,
+            "height": image.height
+        }
+        with self._lock:
+            self.items.append(item)
+            self._index[item_id] = item
+            self._remember(item_id, thumbnail)
+        return item_id
+
+    def get_item(self, item_id: str) -> Optional[Dict]:
+        """Get metadata for one item"""
+        return self._index.get(item_id)
+
+    def page(self, page_number: int, page_size: int = 9) -> List[Dict]:
+        """Get the items on one page (1-based), oldest first"""
+        start = (page_number - 1) * page_size
+        return self.items[start:start + page_size]
+
+    def page_count(self, page_size: int = 9) -> int:
+        """Number of pages needed to show every item"""
+        return max(1, -(-len(self.items) // page_size))
+
+    def thumbnail(self, item_id: str) -> bytes:
+        """Get thumbnail bytes from memory, the thumbnail file, or the full image"""
+        with self._lock:
+            if item_id in self._thumbnails:
+                self._thumbnails.move_to_end(item_id)
+                return self._thumbnails[item_id]
+
+        thumbnail_path = self._thumbnail_path(item_id)
+        try:
+            with open(thumbnail_path, 'rb') as f:
+                thumbnail = f.read()
+        except OSError:
+            with Image.open(self.get_item(item_id)["path"]) as image:
+                thumbnail = self._make_thumbnail(image)
+            with open(thumbnail_path, 'wb') as f:
+                f.write(thumbnail)
+        with self._lock:
+            self._remember(item_id, thumbnail)
+        return thumbnail
+
+    def load_image_bytes(self, item_id: str) -> bytes:
+        """Read the full-resolution image from disk"""
+        with open(self.get_item(item_id)["path"], 'rb') as f:
+            return f.read()
+
+    def touch(self):
+        """
+        Mark the gallery as in use so remove_stale_galleries keeps it
+
+        If its directory was removed anyway (the session was idle for
+        longer than the cutoff), the gallery starts over empty rather than
+        pointing at missing files.
+        """
+        try:
+            os.utime(self.storage_dir)
+        except FileNotFoundError:
+            self.clear()
+
+    def clear(self):
+        """Remove all items and their files"""
+        with self._lock:
+            self.items = []
+            self._index.clear()
+            self._thumbnails.clear()
+            self._memory_bytes = 0
+            shutil.rmtree(self.storage_dir, ignore_errors=True)
+            os.makedirs(self.storage_dir, exist_ok=True)
+
+    def _make_thumbnail(self, image: Image.Image) -> bytes:
+        return make_thumbnail(image, self.thumbnail_size, self.thumbnail_format, self.thumbnail_quality)
+
+    def _thumbnail_path(self, item_id: str) -> str:
+        extension = THUMBNAIL_FORMATS[self.thumbnail_format]
+        return os.path.join(self.storage_dir, f"{item_id}.thumb.{extension}")
+
+    def _remember(self, item_id: str, thumbnail: bytes):
+        self._memory_bytes -= len(self._thumbnails.pop(item_id, b""))
+        self._thumbnails[item_id] = thumbnail
+        self._memory_bytes += len(thumbnail)
+        while self._memory_bytes > self.max_memory_bytes and len(self._thumbnails) > 1:
+            _, evicted = self._thumbnails.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+def remove_stale_galleries(root_dir: str, max_age_seconds: float = 24 * 60 * 60):
+    """Delete session directories that have not been written to or touched recently"""
+    if not os.path.isdir(root_dir):
+        return
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(root_dir):
+        path = os.path.join(root_dir, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
@@ -0,0 +1,125 @@
+"""Share one in-flight call between concurrent identical requests"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+class _Flight:
+    """A call in progress and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share a key
+
+    The first caller for a key runs the function; callers that arrive with
+    the same key while it is still running wait for it and receive the same
+    value (or exception) instead of starting their own call. Nothing is
+    remembered once the call finishes, so this complements the result
+    cache rather than replacing it.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.saved = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for every concurrent caller with this key
+
+        Returns:
+            (value, shared): shared is True when the value came from
+            another caller's call
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                leader = True
+            else:
+                self.saved += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        try:
+            flight.value = fn()
+            return flight.value, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict:
+        """Get call and saved-call counters"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "saved": self.saved,
+                "in_flight": len(self._flights)
+            }
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines running on one event loop
+
+    The shared call runs as its own task, so a caller that is cancelled or
+    times out stops waiting without taking the call away from the others;
+    the call itself is cancelled only when its last waiter leaves.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, list] = {}  # key -> [task, waiters]
+        self.calls = 0
+        self.saved = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn() once for every concurrent caller with this key
+
+        Returns:
+            (value, shared): shared is True when the value came from
+            another caller's call
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if shared:
+            self.saved += 1
+        else:
+            self.calls += 1
+            flight = self._flights[key] = [asyncio.ensure_future(fn()), 0]
+            flight[0].add_done_callback(lambda _: self._forget(key, flight))
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                self._forget(key, flight)  # Later callers start a fresh call
+                task.cancel()
+
+    def _forget(self, key: str, flight: list):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict:
+        """Get call and saved-call counters"""
+        return {
+            "calls": self.calls,
+            "saved": self.saved,
+            "in_flight": len(self._flights)
+        }
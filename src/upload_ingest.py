@@ -0,0 +1,101 @@
+"""Decode and normalise uploaded images cheaply"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+class UploadRejected(ValueError):
+    """Raised when an upload is not an image or is too large to decode safely"""
+
+class UploadIngestor:
+    """
+    Turn uploaded bytes into a bounded-size RGB (or greyscale) image
+
+    The header is checked against `max_pixels` before any pixel data is
+    decoded. JPEGs are decoded in draft mode, letting libjpeg scale by 1/2,
+    1/4 or 1/8 on the fly, so a large photo never exists in memory at full
+    size; other formats are reduced right after decoding. Normalised images
+    are kept in a small LRU keyed by content hash, so page reruns with the
+    same upload skip decoding entirely.
+
+    Args:
+        max_side: Longest side of the normalised image in pixels
+        max_pixels: Largest width x height accepted
+        max_entries: Normalised uploads kept in memory
+    """
+
+    def __init__(self, max_side: int = 2048, max_pixels: int = 50_000_000, max_entries: int = 8):
+        self.max_side = max_side
+        self.max_pixels = max_pixels
+        self.max_entries = max_entries
+        self._images = OrderedDict()  # content hash -> normalised image
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def ingest(self, data: bytes, mode: str = "RGB") -> Image.Image:
+        """
+        Decode an upload, reusing the result for identical bytes
+
+        Args:
+            data: Uploaded file contents
+            mode: "RGB", or "L" for greyscale uploads such as masks
+
+        Raises:
+            UploadRejected: If the data is not a readable image or exceeds max_pixels
+        """
+        key = f"{hashlib.sha256(data).hexdigest()}:{mode}"
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+            self.misses += 1
+
+        image = self._decode(data, mode)
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    def stats(self) -> Dict:
+        """Get cache hit and miss counts"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._images)}
+
+    def _decode(self, data: bytes, mode: str) -> Image.Image:
+        try:
+            image = Image.open(BytesIO(data))  # Reads the header only
+        except Image.DecompressionBombError as e:
+            raise UploadRejected(f"Image is too large to process safely: {e}")
+        except UnidentifiedImageError:
+            raise UploadRejected("The uploaded file is not a supported image")
+        except OSError as e:  # Header cut short
+            raise UploadRejected(f"The uploaded image could not be read: {e}")
+
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise UploadRejected(
+                f"Image is {width}x{height} ({width * height / 1e6:.0f} MP); "
+                f"the limit is {self.max_pixels / 1e6:.0f} MP"
+            )
+
+        scale = min(self.max_side / max(width, height), 1.0)
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        try:
+            image.draft(mode, target)  # No-op for formats other than JPEG
+            if image.mode != mode:
+                image = image.convert(mode)
+            if image.size != target:
+                image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+            # Phone photos store their rotation in EXIF; apply it on the small image
+            return ImageOps.exif_transpose(image)
+        except Image.DecompressionBombError as e:
+            raise UploadRejected(f"Image is too large to process safely: {e}")
+        except OSError as e:  # Truncated or corrupt pixel data
+            raise UploadRejected(f"The uploaded image could not be read: {e}")
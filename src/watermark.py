@@ -0,0 +1,83 @@
+"""Watermark overlays rendered once and composited into image corners"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+@lru_cache(maxsize=32)
+def render_overlay(text: str, font_path: Optional[str] = None, font_size: Optional[int] = None,
+                   padding: int = 5) -> Image.Image:
+    """
+    Render the watermark label (text on a translucent box) as an RGBA tile
+
+    Tiles are cached per (text, font, size), so text is measured and drawn
+    once per process rather than once per image.
+    """
+    if font_path:
+        font = ImageFont.truetype(font_path, font_size or 16)
+    elif font_size:
+        font = ImageFont.load_default(font_size)
+    else:
+        font = ImageFont.load_default()
+
+    left, top, right, bottom = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), text, font=font)
+    tile = Image.new("RGBA", (right - left + 2 * padding, bottom - top + 2 * padding), (0, 0, 0, 128))
+    ImageDraw.Draw(tile).text((padding - left, padding - top), text, font=font, fill=(255, 255, 255, 200))
+    return tile
+
+class Watermarker:
+    """
+    Stamp a cached text overlay into the bottom-right corner of images
+
+    Args:
+        text: Default watermark text
+        font_path: TrueType font file; Pillow's default font when None
+        font_size: Font size in points; Pillow's default when None
+        margin: Distance in pixels between the overlay and the image edges
+        max_workers: Threads used by apply_many
+    """
+
+    def __init__(
+        self,
+        text: str = "AI Generated",
+        font_path: Optional[str] = None,
+        font_size: Optional[int] = None,
+        margin: int = 5,
+        max_workers: int = 4
+    ):
+        self.text = text
+        self.font_path = font_path
+        self.font_size = font_size
+        self.margin = margin
+        self.max_workers = max_workers
+
+    def apply(self, image: Image.Image, text: Optional[str] = None) -> Image.Image:
+        """
+        Return a watermarked copy of image
+
+        Only the corner under the overlay is converted and composited; the
+        rest of the image is copied as-is, so the source (which may be a
+        result shared with other sessions) is never modified.
+        """
+        tile = render_overlay(text or self.text, self.font_path, self.font_size)
+        watermarked = image.copy() if image.mode in ("RGB", "RGBA", "L") else image.convert("RGB")
+
+        width, height = watermarked.size
+        left = width - tile.width - self.margin
+        top = height - tile.height - self.margin
+        box = (max(left, 0), max(top, 0), min(left + tile.width, width), min(top + tile.height, height))
+        if box[0] >= box[2] or box[1] >= box[3]:
+            return watermarked  # Image too small for any of the overlay
+
+        region = watermarked.crop(box).convert("RGBA")
+        region.alpha_composite(tile, source=(box[0] - left, box[1] - top))
+        watermarked.paste(region.convert(watermarked.mode), box)
+        return watermarked
+
+    def apply_many(self, images: List[Image.Image], text: Optional[str] = None) -> List[Image.Image]:
+        """Watermark several images in parallel, keeping their order"""
+        if len(images) <= 1:
+            return [self.apply(image, text) for image in images]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(images))) as pool:
+            return list(pool.map(lambda image: self.apply(image, text), images))